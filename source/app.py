@@ -1,46 +1,89 @@
 # app.py - a minimal flask api using flask_restful
-from flask import Flask, escape, request, Blueprint
-from provider import DataProvider
+from flask import Flask, escape, request, Blueprint, abort, g
+from provider import DataProvider, registrar_version
 from transformer import DataTransformer
 from manipulator import DataManipulator
-import json
-from config import app
-from unittest import TestLoader, runner
-from argparse import ArgumentParser
-from decorators import tiene_jwt, get_token
-import pandas as pd
+import respuestas
+from config import app, cache
+from decorators import tiene_jwt, get_token, memoizado_en_request, en_paralelo, respuesta_cacheada
+import snapshots
+import procesos
+import metricas
+import time
 from datetime import date, timedelta
 
-parser = ArgumentParser(prog='App',
-                        description='App de Flask')
+bp = Blueprint('rutas', __name__)
 
-parser.add_argument(
-    'mode', type=str, help='Modo de ejecucion (runserver|tests)'
-)
 
-args = parser.parse_args()
+@bp.before_request
+def iniciar_metricas():
+    if metricas.activas():
+        g.etapas = []
+        g.inicio = time.perf_counter()
 
-bp = Blueprint('rutas', __name__)
+
+@bp.after_request
+def agregar_server_timing(response):
+    if app.config['SERVER_TIMING'] and 'etapas' in g:
+        response.headers['Server-Timing'] = metricas.server_timing(g.etapas, time.perf_counter() - g.inicio)
+    return response
+
+
+@memoizado_en_request('materiascursadas')
+def get_materiascursadas_indexer(carrera):
+    """
+        Trae el indice por alumno y por materia de las cursadas de la carrera
+        Se memoiza por request, el DataFrame no debe modificarse in place
+    """
+    token = get_token(request)
+    return DataProvider().get_materiascursadas_indexer(token, carrera)
+
+
+def get_materiascursadas_data(carrera):
+    """
+        Trae las cursadas de la carrera como DataFrame
+    """
+    return get_materiascursadas_indexer(carrera).df
+
+
+@memoizado_en_request('plan')
+def get_plan_data(carrera, plan):
+    token = get_token(request)
+    plan_json = DataProvider().get_plan(token, carrera, plan)
+    return DataTransformer().transform_to_dataframe(plan_json)
+
+
+@memoizado_en_request('alumnos')
+def get_alumnos_de_carrera_data(carrera):
+    token = get_token(request)
+    alumnos_json = DataProvider().get_alumnos_de_carrera(token, carrera)
+    return DataTransformer().transform_to_dataframe(alumnos_json)
+
+
+@memoizado_en_request('inscriptos')
+def get_inscriptos_data(carrera, anio=None, mes=None):
+    token = get_token(request)
+    inscriptos_json = DataProvider().get_inscriptos(token, carrera, anio, mes)
+    return DataTransformer().transform_materiascursadas_to_dataframe(inscriptos_json)
+
+
+@memoizado_en_request('materias-necesarias')
+def get_cantidad_materias_necesarias_data(carrera, plan):
+    token = get_token(request)
+    return DataProvider().get_cantidad_materias_necesarias(token, carrera, plan)["cantidad"]
 
 
 def get_materiascursadas(request, cod_carrera=None, inicio=None, fin=None):
 
-    provider = DataProvider()
-    transformer = DataTransformer()
     manipulator = DataManipulator()
 
-    # Saco el token del request
-    token = get_token(request)
     # Formateo los args
     fecha_inicio = inicio or request.args.get('inicio')
     fecha_fin = fin or request.args.get('fin')
     # Tiene que ser una sola carrera y un solo plan para calcular creditos
     carrera = cod_carrera or request.args.get('carrera')
-    plan = request.args.get('plan')
     # Traigo las cursadas
-    cursadas_json = provider.get_materiascursadas(token, carrera)
-    cursadas_data = transformer.transform_materiascursadas_to_dataframe(
-        cursadas_json)
+    cursadas_data = get_materiascursadas_data(carrera)
 
     # Filtro periodo
     df = manipulator.filtrar_periodo(cursadas_data, fecha_inicio, fecha_fin)
@@ -49,56 +92,162 @@ def get_materiascursadas(request, cod_carrera=None, inicio=None, fin=None):
 
 def get_alumnos_de_materia_periodo(request, cod_materia):
     manipulator = DataManipulator()
-    df = get_materiascursadas(request)
-    return manipulator.filtrar_alumnos_de_materia(df, cod_materia)
+    indexer = get_materiascursadas_indexer(request.args.get('carrera'))
+    df = indexer.filtrar_materia(cod_materia)
+    return manipulator.filtrar_periodo(df, request.args.get('inicio'), request.args.get('fin'))
 
 
 def get_cantidad_materias_necesarias(request):
-    provider = DataProvider()
-    # Saco el token del request
-    token = get_token(request)
     carrera = request.args.get('carrera')
     plan = request.args.get('plan')
-    return provider.get_cantidad_materias_necesarias(token, carrera, plan)["cantidad"]
+    return get_cantidad_materias_necesarias_data(carrera, plan)
 
 
 def get_plan(request, carrera=None):
-    provider = DataProvider()
-    transformer = DataTransformer()
-
-    # Saco el token del request
-    token = get_token(request)
-    # Formateo los args
-    fecha_inicio = request.args.get('inicio')
-    fecha_fin = request.args.get('fin')
     # Tiene que ser una sola carrera y un solo plan para calcular creditos
     carrera = carrera or request.args.get('carrera')
     plan = request.args.get('plan')
     # Traigo el plan
-    plan_json = provider.get_plan(token, carrera, plan)
-    plan_data = transformer.transform_to_dataframe(plan_json)
-    return plan_data
+    return get_plan_data(carrera, plan)
+
+
+def get_snapshot_carrera(request, carrera=None):
+    """
+        Snapshot ya preparado de la carrera y plan del request. Si todavia no hay,
+        se pide construirlo en segundo plano y retorna None, para que el request
+        siga calculando todo como siempre.
+        Si hay, se revalidan las cursadas en cache si estan vencidas, y si su version ya no es
+        la del snapshot se pide reconstruirlo, mientras se sigue sirviendo el que hay
+    """
+    if not app.config['USAR_SNAPSHOTS']:
+        return None
+    carrera = carrera or request.args.get('carrera')
+    plan = request.args.get('plan')
+    token = get_token(request)
+    snapshot = snapshots.get_snapshot(carrera, plan)
+    if snapshot is None:
+        snapshots.refrescar_en_segundo_plano(token, carrera, plan)
+        return None
+    snapshots.recordar_token(token, carrera, plan)
+    if DataProvider().revalidar_materiascursadas(token, carrera) != snapshot.version:
+        snapshots.refrescar_en_segundo_plano(token, carrera, plan)
+    for clave, version in snapshot.versiones.items():
+        registrar_version(clave, version)
+    return snapshot
 
 
 def get_materiascursadas_plan(request, carrera=None):
     transformer = DataTransformer()
+    manipulator = DataManipulator()
+
+    snapshot = get_snapshot_carrera(request, carrera)
+    if snapshot:
+        inicio, fin = request.args.get('inicio'), request.args.get('fin')
+        return (manipulator.filtrar_periodo(snapshot.merged, inicio, fin),
+                manipulator.filtrar_periodo(snapshot.cursadas, inicio, fin),
+                snapshot.plan_data)
 
-    cursadas_data = get_materiascursadas(request, carrera)
-    plan_data = get_plan(request, carrera)
+    cursadas_data, plan_data = en_paralelo(
+        lambda: get_materiascursadas(request, carrera),
+        lambda: get_plan(request, carrera))
     data = transformer.merge_materias_con_plan(cursadas_data, plan_data)
     return data, cursadas_data, plan_data
 
 
-def get_materiascursadas_promedio(request, carrera, inicio=None, fin=None):
-    cursadas_data = get_materiascursadas(request, carrera, inicio, fin)
+def get_materiascursadas_alumno_plan(request, legajo, carrera=None):
+    """
+        Igual que get_materiascursadas_plan, pero solo con las cursadas del alumno,
+        que se buscan por indice antes de mergear con el plan
+    """
+    return get_materiascursadas_alumnos_plan(request, [legajo], carrera)
+
+
+def get_materiascursadas_alumnos_plan(request, legajos, carrera=None):
+    """
+        Igual que get_materiascursadas_alumno_plan, pero con las cursadas de varios alumnos
+    """
+    transformer = DataTransformer()
+    manipulator = DataManipulator()
+
+    carrera = carrera or request.args.get('carrera')
+    inicio, fin = request.args.get('inicio'), request.args.get('fin')
+    snapshot = get_snapshot_carrera(request, carrera)
+    if snapshot:
+        data = manipulator.filtrar_periodo(snapshot.indexer.filtrar_alumnos(legajos), inicio, fin)
+        cursadas_alumnos = manipulator.filtrar_periodo(
+            snapshot.indexer_cursadas.filtrar_alumnos(legajos), inicio, fin)
+        return data.reset_index(drop=True), cursadas_alumnos, snapshot.plan_data
+
+    indexer, plan_data = en_paralelo(
+        lambda: get_materiascursadas_indexer(carrera),
+        lambda: get_plan(request, carrera))
+    cursadas_alumnos = manipulator.filtrar_periodo(indexer.filtrar_alumnos(legajos), inicio, fin)
+    data = transformer.merge_materias_con_plan(cursadas_alumnos, plan_data)
+    return data, cursadas_alumnos, plan_data
+
+
+def get_scores_alumnos(request, legajos, materias_alumnos):
+    """
+        Scores por periodo de los alumnos. Sin filtro de fechas salen ya calculados del snapshot
+    """
+    snapshot = get_snapshot_carrera(request)
+    if snapshot and not request.args.get('inicio') and not request.args.get('fin'):
+        return snapshot.indexer_scores.filtrar_alumnos(legajos)
+    return procesos.calcular('get_scores_periodos', materias_alumnos)
+
+
+METRICAS_ALUMNO = ('notas', 'scores', 'porcentajes-areas',
+                   'porcentajes-nucleos', 'porcentaje-carrera')
+
+
+def sin_vacios(serie):
+    """
+        Reemplaza los valores vacios (None, '') por '', como valor or ''
+    """
+    serie = serie.astype(object)
+    return serie.where(serie.map(bool).astype(bool), '')
+
+
+def formatear_notas(materias_alumno):
+    """
+        Precondicion: las fechas ya vienen formateadas como texto
+    """
+    actas = {columna: sin_vacios(materias_alumno[columna]) for columna in ('acta_examen', 'acta_promocion')}
+    return respuestas.registros(materias_alumno.assign(**actas), {
+        'fecha': 'Fecha', 'materia': 'Materia', 'plan': 'Plan', 'nota': 'Nota', 'resultado': 'Resultado',
+        'acta_examen': 'Acta Examen', 'acta_promocion': 'Acta Promocion'})
+
+
+def formatear_scores(scores):
+    return respuestas.registros(scores, {'periodo_semestre': 'nombre', 'score_periodo': 'valor'})
+
+
+def formatear_porcentajes(data):
+    return [{"nombre": nombre, "valor": valor} for nombre, valor in data.items()]
+
+
+def formatear_porcentaje_carrera(porcentaje):
+    return {'nombre': 'Porcentaje de avance en carrera', 'valor': str(round(porcentaje, 2))}
+
+
+def get_porcentajes_carrera(request, carrera, columna):
+    """
+        Porcentajes de aprobacion por area (o nucleo) de todos los alumnos de la carrera
+    """
+    merged_data, _, plan_data = get_materiascursadas_plan(request, carrera)
+    manipulator = DataManipulator()
+    matriz = manipulator.matriz_porcentajes_aprobadas(plan_data, merged_data, columna)
+    return [{"Alumno": legajo, "Porcentajes": formatear_porcentajes(manipulator.porcentajes_alumno(matriz, legajo))}
+            for legajo in matriz.index]
+
 
+def get_materiascursadas_promedio(request, carrera, inicio=None, fin=None):
     transformer = DataTransformer()
 
-    # Obtengo los alumnos de la carrera
-    token = get_token(request)  # Saco el token del request
-    alumnos_carrera_json = DataProvider().get_alumnos_de_carrera(token, carrera)
-    alumnos_carrera_df = transformer.transform_to_dataframe(
-        alumnos_carrera_json)
+    # Obtengo las cursadas y los alumnos de la carrera
+    cursadas_data, alumnos_carrera_df = en_paralelo(
+        lambda: get_materiascursadas(request, carrera, inicio, fin),
+        lambda: get_alumnos_de_carrera_data(carrera))
     data = transformer.merge_materias_con_promedio(
         cursadas_data, alumnos_carrera_df)
     return data
@@ -106,9 +255,8 @@ def get_materiascursadas_promedio(request, carrera, inicio=None, fin=None):
 
 @bp.route('/materias/<cod_materia>/recursantes')
 @tiene_jwt
+@respuesta_cacheada
 def recursantes_materia(cod_materia):
-    token = get_token(request)
-
     cod_materia = cod_materia.zfill(5)
     carrera = request.args.get('carrera')
     fecha_fin = request.args.get('fecha')
@@ -117,20 +265,18 @@ def recursantes_materia(cod_materia):
     semestre = 1 if mes and int(mes) <= 6 else 2
     dm = DataManipulator()
 
-    # Filtro los inscriptos de la carrera y materia
-    inscriptos = DataProvider().get_inscriptos(token, carrera, anio, semestre)
-    inscriptos_df = DataTransformer().transform_materiascursadas_to_dataframe(inscriptos)
-
-    # Filtro las cursadas de la carrera y materia
-    cursadas = DataProvider().get_materiascursadas(token, carrera)
-    cursadas_df = DataTransformer().transform_materiascursadas_to_dataframe(cursadas)
+    # Traigo los inscriptos y las cursadas de la carrera
+    inscriptos_df, cursadas_df = en_paralelo(
+        lambda: get_inscriptos_data(carrera, anio, semestre),
+        lambda: get_materiascursadas_indexer(carrera).filtrar_materia(cod_materia))
 
     recursantes = dm.get_recursantes(cursadas_df, inscriptos_df, cod_materia)
-    return json.dumps([{"Legajo": key, "Cantidad": value} for key, value in recursantes.items()])
+    return respuestas.dumps([{"Legajo": key, "Cantidad": value} for key, value in recursantes.items()])
 
 
 @bp.route('/materias/<cod_materia>/detalle-aprobados')
 @tiene_jwt
+@respuesta_cacheada
 def detalle_aprobados(cod_materia):
     manipulator = DataManipulator()
     transformer = DataTransformer()
@@ -141,11 +287,12 @@ def detalle_aprobados(cod_materia):
     resultado = {}
     for nombre, valor in data.items():
         resultado[transformer.get_forma_aprobacion(nombre)] = valor
-    return json.dumps([resultado])
+    return respuestas.dumps([resultado])
 
 
 @bp.route('/materias/<cod_materia>/basicos')
 @tiene_jwt
+@respuesta_cacheada
 def datos_basicos_materia(cod_materia):
     manipulator = DataManipulator()
     df = get_materiascursadas(request)
@@ -154,7 +301,7 @@ def datos_basicos_materia(cod_materia):
     ausentes = manipulator.cantidad_alumnos_ausentes(df, cod_materia)
     faltantes = manipulator.cantidad_alumnos_falta_aprobar(df, cod_materia)
     nombre = manipulator.get_nombre_materia(df, cod_materia)
-    return json.dumps([{'Aprobados': aprobados,
+    return respuestas.dumps([{'Aprobados': aprobados,
                         'Ausentes': ausentes,
                         'Desaprobados': desaprobados,
                         'Faltantes': faltantes}])
@@ -162,84 +309,126 @@ def datos_basicos_materia(cod_materia):
 
 @bp.route('/materias/<cod_materia>/dispersion-notas')
 @tiene_jwt
+@respuesta_cacheada
 def dispersion_notas(cod_materia):
     transformer = DataTransformer()
-    provider = DataProvider()
-    token = get_token(request)  # Saco el token del request
-    df = get_alumnos_de_materia_periodo(request, cod_materia)
-
-    alumnos_carrera_json = provider.get_alumnos_de_carrera(
-        token, request.args.get('carrera'))
-    alumnos_carrera_df = transformer.transform_to_dataframe(
-        alumnos_carrera_json)
+    df, alumnos_carrera_df = en_paralelo(
+        lambda: get_alumnos_de_materia_periodo(request, cod_materia),
+        lambda: get_alumnos_de_carrera_data(request.args.get('carrera')))
     data = transformer.merge_materias_con_promedio(df, alumnos_carrera_df)
-    # Itero para generar el json final
-    resultado = []
-    for row in data.itertuples():
-        nota = getattr(row, 'nota')
-        if nota:
-            resultado.append({"Promedio": getattr(
-                row, 'promedio'), "Alumno": getattr(row, 'alumno'), "Nota": nota})
-    return json.dumps(resultado)
+    # Solo las que tienen nota
+    data = data.loc[data['nota'].astype(object).map(bool).astype(bool)]
+    return respuestas.tabla(request, data, {'promedio': 'Promedio', 'alumno': 'Alumno', 'nota': 'Nota'})
 
 
 @bp.route('/alumnos/<legajo>/porcentajes-areas')
 @tiene_jwt
+@respuesta_cacheada
 def porcentajes_areas_alumno(legajo):
-    merged_data, _, plan_data = get_materiascursadas_plan(request)
+    materias_alumno, _, plan_data = get_materiascursadas_alumno_plan(
+        request, legajo)
 
-    fecha_inicio = request.args.get('inicio')
-    fecha_fin = request.args.get('fin')
     manipulator = DataManipulator()
-    materias_alumno = manipulator.filtrar_materias_de_alumno(
-        merged_data, legajo)
-    materias_alumno = manipulator.filtrar_periodo(
-        materias_alumno, fecha_inicio, fecha_fin)
     data = manipulator.porcentajes_aprobadas_areas(
         plan_data, materias_alumno)
-    return json.dumps([{"nombre": nombre, "valor": valor} for nombre, valor in data.items()])
+    return respuestas.dumps(formatear_porcentajes(data))
 
 
 @bp.route('/alumnos/<legajo>/porcentajes-nucleos')
 @tiene_jwt
+@respuesta_cacheada
 def porcentajes_nucleos_alumno(legajo):
-    merged_data, _, plan_data = get_materiascursadas_plan(request)
+    materias_alumno, _, plan_data = get_materiascursadas_alumno_plan(
+        request, legajo)
 
-    fecha_inicio = request.args.get('inicio')
-    fecha_fin = request.args.get('fin')
     manipulator = DataManipulator()
-    materias_alumno = manipulator.filtrar_materias_de_alumno(
-        merged_data, legajo)
-    materias_alumno = manipulator.filtrar_periodo(
-        materias_alumno, fecha_inicio, fecha_fin)
     data = manipulator.porcentajes_aprobadas_nucleos(
         plan_data, materias_alumno)
-    return json.dumps([{"nombre": nombre, "valor": valor} for nombre, valor in data.items()])
+    return respuestas.dumps(formatear_porcentajes(data))
+
+
+@bp.route('/carreras/<carrera>/porcentajes-areas')
+@tiene_jwt
+@respuesta_cacheada
+def porcentajes_areas_carrera(carrera):
+    '''
+        Deberia retornar una lista del tipo [{"Alumno": "1", "Porcentajes": [{"nombre": "Inglés", "valor": 50.0}, ...]}, ...]
+    '''
+    return respuestas.dumps(get_porcentajes_carrera(request, carrera, 'area'))
+
+
+@bp.route('/carreras/<carrera>/porcentajes-nucleos')
+@tiene_jwt
+@respuesta_cacheada
+def porcentajes_nucleos_carrera(carrera):
+    return respuestas.dumps(get_porcentajes_carrera(request, carrera, 'nucleo'))
+
+
+@bp.route('/carreras/<carrera>/snapshot', methods=['POST'])
+@tiene_jwt
+def refrescar_snapshot(carrera):
+    '''
+        Pide reconstruir el snapshot de la carrera y plan, sin esperar a que termine
+    '''
+    plan = request.args.get('plan')
+    snapshots.refrescar_en_segundo_plano(get_token(request), carrera, plan)
+    return respuestas.dumps({'carrera': carrera, 'plan': plan}), 202
+
+
+@bp.route('/carreras/<carrera>/materiascursadas/sincronizar', methods=['POST'])
+@tiene_jwt
+def sincronizar_materiascursadas(carrera):
+    '''
+        Actualiza las materias cursadas de la carrera en cache. Por defecto solo trae
+        las nuevas, con completa=true las vuelve a traer todas
+    '''
+    completa = request.args.get('completa') == 'true'
+    version, data = DataProvider().sincronizar_materiascursadas(get_token(request), carrera, completa=completa)
+    return respuestas.dumps({'carrera': carrera, 'version': version, 'cantidad': len(data)})
+
+
+@bp.route('/estadisticas/cache')
+@tiene_jwt
+def estadisticas_cache():
+    '''
+        Hits y misses de cada nivel de la cache de este proceso
+    '''
+    return respuestas.dumps(cache.estadisticas())
+
+
+@bp.route('/estadisticas/etapas')
+@tiene_jwt
+def estadisticas_etapas():
+    '''
+        Tiempo, filas y bytes acumulados de cada etapa en este proceso (con METRICAS activado)
+    '''
+    return respuestas.dumps(metricas.estadisticas())
 
 
 @bp.route('/carreras/<carrera>/alumnos')
 @tiene_jwt
+@respuesta_cacheada
 def alumnos_carrera(carrera):
-    token = get_token(request)
     transformer = DataTransformer()
-    json_data = DataProvider().get_alumnos_de_carrera(token, carrera)
-    data = transformer.transform_to_dataframe(json_data)
+    data = get_alumnos_de_carrera_data(carrera)
     inscriptos = DataManipulator().inscriptos_por_carrera(data)['alumno']
-    return json.dumps([{"nombre": transformer.transform_timestamp_to_semester(key), "cantidad": value} for key, value in inscriptos.items()])
+    return respuestas.dumps([{"nombre": transformer.transform_timestamp_to_semester(key), "cantidad": value} for key, value in inscriptos.items()])
 
 
 @bp.route('/carreras/<carrera>/cantidades-alumnos')
 @tiene_jwt
+@respuesta_cacheada
 def cantidades_alumnos_carrera(carrera):
     '''
         Deberia retornar una lista del tipo [{"Cohorte": 2015, "Graduados": 2, "Cursantes": 200, "Ingresantes": 100, "postulantes": 500}]
     '''
     token = get_token(request)
     provider = DataProvider()
-    graduados = provider.get_graduados(token, carrera)
-    ingresantes = provider.get_ingresantes(token, carrera)
-    cursantes = provider.get_cursantes(token, carrera)
-    return json.dumps([{"Cohorte": cursantes[i]["anio"],
+    graduados, ingresantes, cursantes = en_paralelo(
+        lambda: provider.get_graduados(token, carrera),
+        lambda: provider.get_ingresantes(token, carrera),
+        lambda: provider.get_cursantes(token, carrera))
+    return respuestas.dumps([{"Cohorte": cursantes[i]["anio"],
                         "Graduados": graduados[i]["cantidad"],
                         "Cursantes": cursantes[i]["cantidad"],
                         "Ingresantes": ingresantes[i]["cantidad"]}
@@ -249,6 +438,7 @@ def cantidades_alumnos_carrera(carrera):
 
 @bp.route('/carreras/<carrera>/cantidades-ingresantes')
 @tiene_jwt
+@respuesta_cacheada
 def cantidades_ingresantes_carrera(carrera):
     '''
         Deberia retornar una lista del tipo [{"anio": 2015, "Ingresantes": 100}]
@@ -256,104 +446,184 @@ def cantidades_ingresantes_carrera(carrera):
     token = get_token(request)
     provider = DataProvider()
     ingresantes = provider.get_ingresantes(token, carrera)
-    return json.dumps([{"Cohorte": dato["anio"], "Ingresantes": dato["cantidad"]} for dato in ingresantes])
+    return respuestas.dumps([{"Cohorte": dato["anio"], "Ingresantes": dato["cantidad"]} for dato in ingresantes])
 
 
 @bp.route('/carreras/<carrera>/cursantes-actual')
 @tiene_jwt
+@respuesta_cacheada
 def cantidad_cursantes_actual(carrera):
     token = get_token(request)
     provider = DataProvider()
     anio = date.today().year
     cursantes = provider.get_cursantes(token, carrera, anio)
-    return json.dumps({'nombre': 'Cursantes del año actual', 'valor': cursantes["cantidad"]})
+    return respuestas.dumps({'nombre': 'Cursantes del año actual', 'valor': cursantes["cantidad"]})
 
 
 @bp.route('/carreras/<carrera>/ingresantes-actual')
 @tiene_jwt
+@respuesta_cacheada
 def cantidad_ingresantes_actual(carrera):
     token = get_token(request)
     provider = DataProvider()
     anio = date.today().year
     cursantes = provider.get_ingresantes(token, carrera, anio)
-    return json.dumps({'nombre': 'Ingresantes del año actual', 'valor': cursantes["cantidad"]})
+    return respuestas.dumps({'nombre': 'Ingresantes del año actual', 'valor': cursantes["cantidad"]})
 
 
 @bp.route('/carreras/<carrera>/graduados-total')
 @tiene_jwt
+@respuesta_cacheada
 def cantidad_graduados(carrera):
     token = get_token(request)
     provider = DataProvider()
     anio = date.today().year
     cursantes = provider.get_graduados(token, carrera, anio)
-    return json.dumps({'nombre': 'Graduados', 'valor': cursantes["cantidad"]})
+    return respuestas.dumps({'nombre': 'Graduados', 'valor': cursantes["cantidad"]})
 
 
 @bp.route('/alumnos/<legajo>/notas')
 @tiene_jwt
+@respuesta_cacheada
 def notas_alumno(legajo):
-    merged_data, _, plan_data = get_materiascursadas_plan(request)
-    manipulator = DataManipulator()
-    # Filtro las materias
-    materias_alumno = manipulator.filtrar_materias_de_alumno(
-        merged_data, legajo)
-    return json.dumps([{'Fecha': row['fecha'], 'Materia': row['materia'], 'Plan': row['plan'], 'Nota': row['nota'], 'Resultado': row['resultado'], 'Acta Examen': row['acta_examen'] or '', 'Acta Promocion': row['acta_promocion'] or ''} for index, row in materias_alumno.iterrows()])
+    materias_alumno, _, plan_data = get_materiascursadas_alumno_plan(
+        request, legajo)
+    materias_alumno = materias_alumno.assign(
+        fecha=DataTransformer().transform_fechas_to_str(materias_alumno.fecha))
+    return respuestas.dumps(formatear_notas(materias_alumno))
 
 
 @bp.route('/alumnos/<legajo>/scores')
 @tiene_jwt
+@respuesta_cacheada
 def promedios_alumno(legajo):
-    merged_data, _, plan_data = get_materiascursadas_plan(request)
-    manipulator = DataManipulator()
-    scores = manipulator.get_scores_alumno(merged_data, legajo)
-    return json.dumps([{"nombre": row["periodo_semestre"], "valor": row["score_periodo"]} for index, row in DataTransformer().transform_scores_unicos(scores).iterrows()])
+    materias_alumno, _, plan_data = get_materiascursadas_alumno_plan(
+        request, legajo)
+    scores = get_scores_alumnos(request, [legajo], materias_alumno)
+    return respuestas.dumps(formatear_scores(DataTransformer().transform_scores_unicos(scores)))
 
 
 @bp.route('/alumnos/<legajo>/porcentaje-carrera')
 @tiene_jwt
+@respuesta_cacheada
 def alumno_porcentaje_carrera(legajo):
-    merged_data, _, plan_data = get_materiascursadas_plan(request)
+    materias_alumno, _, plan_data = get_materiascursadas_alumno_plan(
+        request, legajo)
     manipulator = DataManipulator()
-    # Filtro las materias
-    materias_alumno = manipulator.filtrar_materias_de_alumno(
-        merged_data, legajo)
     cantidad_aprobadas = manipulator.cantidad_aprobadas(materias_alumno)
     cantidad_materias_necesarias = get_cantidad_materias_necesarias(request)
     porcentaje = manipulator.porcentaje_aprobadas(
         cantidad_aprobadas, cantidad_materias_necesarias)
-    return json.dumps({'nombre': 'Porcentaje de avance en carrera', 'valor': str(round(porcentaje, 2))})
+    return respuestas.dumps(formatear_porcentaje_carrera(porcentaje))
+
+
+@bp.route('/alumnos/batch')
+@tiene_jwt
+@respuesta_cacheada
+def alumnos_batch():
+    '''
+        Calcula las metricas de varios alumnos en un solo request, por ejemplo
+        /alumnos/batch?carrera=W&plan=2019&legajos=1,2,3&metricas=notas,scores
+        Deberia retornar {"1": {"notas": [...], "scores": [...]}, "2": {...}, ...}, con cada
+        metrica en el mismo formato que su endpoint por alumno
+    '''
+    legajos = [legajo for valor in request.args.getlist('legajos')
+               for legajo in valor.split(',') if legajo]
+    # Saco los repetidos manteniendo el orden
+    legajos = list(dict.fromkeys(legajos))
+    pedidas = request.args.get('metricas')
+    pedidas = pedidas.split(',') if pedidas else METRICAS_ALUMNO
+    if not legajos or any(metrica not in METRICAS_ALUMNO for metrica in pedidas):
+        abort(400)
+
+    transformer = DataTransformer()
+    manipulator = DataManipulator()
+
+    # La carrera, el plan y el total de materias se traen una sola vez para todos los alumnos
+    materias_alumnos, _, plan_data = get_materiascursadas_alumnos_plan(request, legajos)
+    if 'porcentaje-carrera' in pedidas:
+        cantidad_materias_necesarias = get_cantidad_materias_necesarias(request)
+
+    resultado = {legajo: {} for legajo in legajos}
+    vacio = materias_alumnos.iloc[0:0]
+
+    if 'notas' in pedidas:
+        notas = materias_alumnos.assign(
+            fecha=transformer.transform_fechas_to_str(materias_alumnos.fecha))
+        grupos = dict(tuple(notas.groupby('alumno', observed=True, sort=False)))
+        for legajo in legajos:
+            resultado[legajo]['notas'] = formatear_notas(grupos.get(legajo, vacio))
+
+    if 'scores' in pedidas:
+        scores = transformer.transform_scores_unicos_por_alumno(
+            get_scores_alumnos(request, legajos, materias_alumnos))
+        grupos = dict(tuple(scores.groupby('alumno', observed=True, sort=False)))
+        for legajo in legajos:
+            resultado[legajo]['scores'] = formatear_scores(grupos.get(legajo, scores.iloc[0:0]))
+
+    for metrica, columna in (('porcentajes-areas', 'area'), ('porcentajes-nucleos', 'nucleo')):
+        if metrica in pedidas:
+            matriz = manipulator.matriz_porcentajes_aprobadas(
+                plan_data, materias_alumnos, columna, alumnos=legajos)
+            for legajo in legajos:
+                resultado[legajo][metrica] = formatear_porcentajes(
+                    manipulator.porcentajes_alumno(matriz, legajo))
+
+    if 'porcentaje-carrera' in pedidas:
+        aprobadas = manipulator.cantidad_aprobadas_por_alumno(materias_alumnos)
+        for legajo in legajos:
+            porcentaje = manipulator.porcentaje_aprobadas(
+                aprobadas.get(legajo, 0), cantidad_materias_necesarias)
+            resultado[legajo]['porcentaje-carrera'] = formatear_porcentaje_carrera(porcentaje)
+
+    return respuestas.dumps(resultado)
 
 
 @bp.route('/carreras/<carrera>/dispersion-score-promedio')
 @tiene_jwt
+@respuesta_cacheada
 def dispersion_score_avance(carrera):
     fin = date.today()
     inicio = fin - timedelta(days=int(request.args.get('dias')))
 
     data = get_materiascursadas_promedio(
         request, carrera, inicio.strftime('%Y-%m-%d'), fin.strftime('%Y-%m-%d'))
-    scores = DataManipulator().get_scores_periodos(data)
+    scores = procesos.calcular('get_scores_periodos', data, conservar=('promedio',))
 
-    return json.dumps([{"Promedio": getattr(row, 'promedio'), "Alumno": getattr(row, 'alumno'), "Score": getattr(row, 'score_periodo')} for row in scores.itertuples()])
+    return respuestas.tabla(request, scores, {'promedio': 'Promedio', 'alumno': 'Alumno', 'score_periodo': 'Score'})
 
 
 @bp.route('/carreras/<carrera>/materias-traba')
 @tiene_jwt
+@respuesta_cacheada
 def materias_traba(carrera):
-    from utils import calcular_score_materia
     merged_data, _, plan_data = get_materiascursadas_plan(request, carrera)
-    manipulator = DataManipulator()
     # Filtro las materias
-    materias = manipulator.calcular_materias_traba(merged_data)
-    return json.dumps([{'Materia': row['materia'], 'Promedio de Aprobación': "%.2f" % row['indice_aprobacion'], 'Obligatorias dependientes': row['cantidad_obligatoria_de'], 'Score': "%.2f" % calcular_score_materia(row['cantidad_obligatoria_de'], row['indice_aprobacion'])} for index, row in materias.iterrows()])
+    materias = procesos.calcular('calcular_materias_traba', merged_data)
+    materias = materias.assign(indice_aprobacion=materias['indice_aprobacion'].map('%.2f'.__mod__),
+                               score=materias['score'].map('%.2f'.__mod__))
+    return respuestas.registros(materias, {'materia': 'Materia', 'indice_aprobacion': 'Promedio de Aprobación',
+                                           'cantidad_obligatoria_de': 'Obligatorias dependientes', 'score': 'Score'})
 
 
 def runserver():
     app.register_blueprint(bp)
+    if app.config['USAR_SNAPSHOTS']:
+        snapshots.iniciar_refresco_periodico()
     app.run(debug=False, host='0.0.0.0')
 
 
+def production():
+    # gunicorn solo hace falta para este modo
+    from wsgi import ServidorWSGI
+    # Con preload, pandas y NumPy se importan antes de forkear para que los workers los compartan
+    import pandas  # noqa: F401
+    app.register_blueprint(bp)
+    ServidorWSGI(app).run()
+
+
 def tests():
+    from unittest import TestLoader, runner
     app.testing = True
     loader = TestLoader()
     tests = loader.discover('source/tests/')
@@ -361,7 +631,23 @@ def tests():
     testRunner.run(tests)
 
 
-modes = {
-    'runserver': runserver,
-    'tests': tests
-}[args.mode]()
+def main():
+    from argparse import ArgumentParser
+    parser = ArgumentParser(prog='App',
+                            description='App de Flask')
+
+    parser.add_argument(
+        'mode', type=str, help='Modo de ejecucion (runserver|production|tests)'
+    )
+
+    args = parser.parse_args()
+
+    modes = {
+        'runserver': runserver,
+        'production': production,
+        'tests': tests
+    }[args.mode]()
+
+
+if __name__ == '__main__':
+    main()
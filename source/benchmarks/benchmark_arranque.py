@@ -0,0 +1,69 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+    Mide, en procesos nuevos, cuanto tarda en importarse la app (arranque en frio)
+    y cuanto tarda el primer request a un endpoint que solo consulta al backend
+    y a uno que usa pandas, con el mock server como backend
+
+    Uso (desde la raiz del proyecto): python source/benchmarks/benchmark_arranque.py [repeticiones]
+"""
+import json
+import os
+import subprocess
+import sys
+import time
+
+DIRECTORIO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+URLS = {
+    'sin pandas': '/carreras/TEST/cantidades-alumnos',
+    'con pandas': '/alumnos/1/porcentajes-areas?carrera=TEST&plan=2019',
+}
+
+
+def medir():
+    """
+        Corre en el proceso nuevo e imprime los tiempos como JSON
+    """
+    inicio = time.perf_counter()
+    sys.path.insert(0, DIRECTORIO)
+    import app
+    tiempo_import = time.perf_counter() - inicio
+
+    sys.path.insert(0, os.path.join(DIRECTORIO, 'tests'))
+    from flask import Flask
+    from provider import DataProvider
+    from mock_server import mock_app
+
+    flask_app = Flask(__name__)
+    flask_app.register_blueprint(app.bp)
+    tiempos = {'import': tiempo_import}
+    with mock_app.run('localhost', 8008):
+        headers = {"Authorization": "Bearer " + DataProvider().retrieve_token()}
+        with flask_app.test_client() as client:
+            for nombre, url in URLS.items():
+                inicio = time.perf_counter()
+                client.get(url, headers=headers)
+                tiempos[nombre] = time.perf_counter() - inicio
+    print(json.dumps(tiempos))
+
+
+def main(repeticiones):
+    entorno = dict(os.environ, STAGE='test', USAR_CACHE='false')
+    mediciones = []
+    for _ in range(repeticiones):
+        salida = subprocess.run([sys.executable, __file__, 'medir'], env=entorno,
+                                check=True, stdout=subprocess.PIPE).stdout
+        mediciones.append(json.loads(salida.decode().strip().splitlines()[-1]))
+    for clave in mediciones[0]:
+        valores = sorted(medicion[clave] for medicion in mediciones)
+        print('{:<28} mediana {:.4f}s'.format(
+            'Import de la app' if clave == 'import' else 'Primer request ' + clave,
+            valores[len(valores) // 2]))
+
+
+if __name__ == '__main__':
+    if sys.argv[1:] == ['medir']:
+        medir()
+    else:
+        main(int(sys.argv[1]) if len(sys.argv) > 1 else 5)
@@ -0,0 +1,52 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+    Compara los pedidos al backend hechos uno despues del otro
+    contra los mismos pedidos hechos en paralelo con en_paralelo,
+    usando el mock server con latencia inyectada
+
+    Uso (desde la raiz del proyecto): python source/benchmarks/benchmark_fanout.py [latencia_en_segundos]
+"""
+import os
+import sys
+import time
+
+DIRECTORIO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, DIRECTORIO)
+sys.path.insert(0, os.path.join(DIRECTORIO, 'tests'))
+
+os.environ['STAGE'] = 'test'
+os.environ['USAR_CACHE'] = 'false'
+
+from config import app  # noqa: E402
+from provider import DataProvider  # noqa: E402
+from decorators import en_paralelo  # noqa: E402
+from mock_server import mock_app  # noqa: E402
+
+
+def main(latencia):
+    os.environ['MOCK_LATENCIA'] = str(latencia)
+    provider = DataProvider()
+    with mock_app.run('localhost', 8008):
+        token = provider.retrieve_token()
+        pedidos = [lambda: provider.get_graduados(token, 'TEST'),
+                   lambda: provider.get_ingresantes(token, 'TEST'),
+                   lambda: provider.get_cursantes(token, 'TEST')]
+
+        inicio = time.time()
+        secuencial = [pedido() for pedido in pedidos]
+        tiempo_secuencial = time.time() - inicio
+
+        with app.test_request_context():
+            inicio = time.time()
+            paralelo = en_paralelo(*pedidos)
+            tiempo_paralelo = time.time() - inicio
+
+    assert secuencial == paralelo
+    print('Latencia del backend: {:.3f}s'.format(latencia))
+    print('Secuencial:  {:.4f}s'.format(tiempo_secuencial))
+    print('En paralelo: {:.4f}s'.format(tiempo_paralelo))
+
+
+if __name__ == '__main__':
+    main(float(sys.argv[1]) if len(sys.argv) > 1 else 0.2)
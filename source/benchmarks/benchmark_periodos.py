@@ -0,0 +1,51 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+    Compara el calculo de periodos fila por fila (row_periodos)
+    contra el calculo vectorizado (aplicar_periodos)
+
+    Uso: python source/benchmarks/benchmark_periodos.py [cantidad_de_filas]
+"""
+import os
+import sys
+import timeit
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from manipulator import DataManipulator  # noqa: E402
+
+
+def generar_cursadas(filas):
+    """
+        Genera un DataFrame de cursadas con fechas aleatorias entre 2000 y 2020
+    """
+    rng = np.random.RandomState(0)
+    dias = rng.randint(0, 365 * 20, size=filas)
+    fechas = pd.Timestamp('2000-01-01') + pd.to_timedelta(dias, unit='D')
+    return pd.DataFrame({'alumno': rng.randint(0, filas // 10 + 1, size=filas).astype(str),
+                         'nota': rng.randint(1, 11, size=filas).astype(float),
+                         'fecha': fechas.strftime('%Y-%m-%d')})
+
+
+def main(filas):
+    manipulator = DataManipulator()
+    df = generar_cursadas(filas)
+
+    por_fila = df.apply(manipulator.row_periodos, axis=1)
+    vectorizado = manipulator.aplicar_periodos(df)
+    pd.testing.assert_frame_equal(por_fila, vectorizado)
+
+    tiempo_fila = min(timeit.repeat(
+        lambda: df.apply(manipulator.row_periodos, axis=1), number=1, repeat=3))
+    tiempo_vectorizado = min(timeit.repeat(
+        lambda: manipulator.aplicar_periodos(df), number=1, repeat=3))
+    print('Filas: {}'.format(filas))
+    print('Por fila:     {:.4f}s'.format(tiempo_fila))
+    print('Vectorizado:  {:.4f}s'.format(tiempo_vectorizado))
+    print('Mejora:       {:.1f}x'.format(tiempo_fila / tiempo_vectorizado))
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 10000)
@@ -0,0 +1,39 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+    Compara el calculo de scores fila por fila (row_score_periodo)
+    contra el calculo agrupado (aplicar_scores)
+
+    Uso: python source/benchmarks/benchmark_scores.py [cantidad_de_filas]
+"""
+import os
+import sys
+import timeit
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from manipulator import DataManipulator  # noqa: E402
+from benchmark_periodos import generar_cursadas  # noqa: E402
+
+
+def main(filas):
+    manipulator = DataManipulator()
+    df = manipulator.aplicar_periodos(generar_cursadas(filas))
+
+    por_fila = df.apply(manipulator.row_score_periodo, args=(df, 2), axis=1)
+    agrupado = manipulator.aplicar_scores(df)
+    pd.testing.assert_frame_equal(por_fila, agrupado)
+
+    tiempo_fila = min(timeit.repeat(
+        lambda: df.apply(manipulator.row_score_periodo, args=(df, 2), axis=1), number=1, repeat=3))
+    tiempo_agrupado = min(timeit.repeat(
+        lambda: manipulator.aplicar_scores(df), number=1, repeat=3))
+    print('Filas: {}'.format(filas))
+    print('Por fila:  {:.4f}s'.format(tiempo_fila))
+    print('Agrupado:  {:.4f}s'.format(tiempo_agrupado))
+    print('Mejora:    {:.1f}x'.format(tiempo_fila / tiempo_agrupado))
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 5000)
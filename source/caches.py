@@ -0,0 +1,225 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import threading
+import time
+from collections import OrderedDict
+
+
+class CacheLocal:
+    """
+        Cache en memoria del proceso, LRU y limitada por la cantidad de bytes de los valores.
+        Cada valor puede tener un tiempo de vida en segundos (0: no expira).
+        Tiene la misma interfaz que el cliente de memcached que usa el provider
+    """
+
+    def __init__(self, max_bytes, max_ttl=0):
+        self.max_bytes = max_bytes
+        # Tiempo de vida maximo de cualquier valor (0: sin maximo)
+        self.max_ttl = max_ttl
+        self.items = OrderedDict()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.RLock()
+
+    def ttl(self, expire):
+        if self.max_ttl and (not expire or expire > self.max_ttl):
+            return self.max_ttl
+        return expire
+
+    def get(self, clave):
+        with self.lock:
+            item = self.items.get(clave)
+            if item is not None and item[1] and item[1] < time.time():
+                self.borrar(clave)
+                item = None
+            if item is None:
+                self.misses += 1
+                return None
+            self.items.move_to_end(clave)
+            self.hits += 1
+            return item[0]
+
+    def get_many(self, claves):
+        resultado = {}
+        for clave in claves:
+            valor = self.get(clave)
+            if valor is not None:
+                resultado[clave] = valor
+        return resultado
+
+    def set(self, clave, valor, expire=0):
+        tamanio = len(valor)
+        # Un valor que no entra en toda la cache no se guarda
+        if tamanio > self.max_bytes:
+            return False
+        expire = self.ttl(expire)
+        with self.lock:
+            self.borrar(clave)
+            self.items[clave] = (valor, time.time() + expire if expire else 0)
+            self.bytes += tamanio
+            # Saco los usados hace mas tiempo hasta entrar en el limite
+            while self.bytes > self.max_bytes:
+                self.borrar(next(iter(self.items)))
+        return True
+
+    def set_many(self, valores, expire=0):
+        for clave, valor in valores.items():
+            self.set(clave, valor, expire=expire)
+        return []
+
+    def add(self, clave, valor, expire=0):
+        """
+            Guarda el valor solo si la clave no esta. Sirve como lock entre threads
+        """
+        with self.lock:
+            item = self.items.get(clave)
+            if item is not None and (not item[1] or item[1] >= time.time()):
+                return False
+            return self.set(clave, valor, expire=expire)
+
+    def delete(self, clave):
+        with self.lock:
+            self.borrar(clave)
+        return True
+
+    def borrar(self, clave):
+        """
+            Precondicion: se tiene el lock
+        """
+        item = self.items.pop(clave, None)
+        if item is not None:
+            self.bytes -= len(item[0])
+
+    def estadisticas(self):
+        return {'hits': self.hits, 'misses': self.misses,
+                'items': len(self.items), 'bytes': self.bytes}
+
+
+class CacheMemcached:
+    """
+        Cliente de memcached que cuenta hits y misses.
+        Si memcached no responde, las lecturas son misses y las escrituras se ignoran
+    """
+
+    def __init__(self, servidor, pool_size=10):
+        from pymemcache.client.base import PooledClient
+        from pymemcache.exceptions import MemcacheError
+        self.cliente = PooledClient(servidor, max_pool_size=pool_size,
+                                    encoding="utf-8", ignore_exc=True)
+        self.errores = (OSError, MemcacheError)
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, clave):
+        return self.get_many([clave]).get(clave)
+
+    def get_many(self, claves):
+        try:
+            resultado = self.cliente.get_many(claves)
+        except self.errores:
+            resultado = {}
+        self.hits += len(resultado)
+        self.misses += len(claves) - len(resultado)
+        return resultado
+
+    def set(self, clave, valor, expire=0):
+        return self.set_many({clave: valor}, expire=expire) == []
+
+    def set_many(self, valores, expire=0):
+        """
+            :return las claves que no se pudieron guardar
+        """
+        try:
+            return self.cliente.set_many(valores, expire=expire)
+        except self.errores:
+            return list(valores)
+
+    def add(self, clave, valor, expire=0):
+        """
+            Guarda el valor solo si la clave no esta. Sirve como lock entre procesos
+        """
+        try:
+            return self.cliente.add(clave, valor, expire=expire, noreply=False)
+        except self.errores:
+            return False
+
+    def delete(self, clave):
+        try:
+            return self.cliente.delete(clave)
+        except self.errores:
+            return False
+
+    def estadisticas(self):
+        return {'hits': self.hits, 'misses': self.misses}
+
+
+class CacheEnNiveles:
+    """
+        Cache local delante de memcached: se lee primero de la local, y lo que se
+        encuentra en memcached se guarda tambien en la local.
+        Las escrituras van a los dos niveles
+    """
+
+    def __init__(self, local, remota):
+        self.local = local
+        self.remota = remota
+
+    def get(self, clave):
+        valor = self.local.get(clave)
+        if valor is None:
+            valor = self.remota.get(clave)
+            if valor is not None:
+                self.local.set(clave, valor)
+        return valor
+
+    def get_many(self, claves):
+        resultado = self.local.get_many(claves)
+        faltantes = [clave for clave in claves if clave not in resultado]
+        if faltantes:
+            remotos = self.remota.get_many(faltantes)
+            self.local.set_many(remotos)
+            resultado.update(remotos)
+        return resultado
+
+    def set(self, clave, valor, expire=0):
+        self.local.set(clave, valor, expire=expire)
+        return self.remota.set(clave, valor, expire=expire)
+
+    def set_many(self, valores, expire=0):
+        self.local.set_many(valores, expire=expire)
+        return self.remota.set_many(valores, expire=expire)
+
+    def add(self, clave, valor, expire=0):
+        # El lock tiene que verse desde todos los procesos, va solo a memcached
+        return self.remota.add(clave, valor, expire=expire)
+
+    def delete(self, clave):
+        self.local.delete(clave)
+        return self.remota.delete(clave)
+
+    def estadisticas(self):
+        local = self.local.estadisticas()
+        remota = self.remota.estadisticas()
+        # Un miss de la cache es un miss de los dos niveles
+        return {'hits': local['hits'] + remota['hits'], 'misses': remota['misses'],
+                'local': local, 'memcached': remota}
+
+
+def crear_cache(config):
+    """
+        Arma la cache segun CACHE_BACKEND:
+            local: solo en memoria del proceso, no necesita ningun servicio
+            memcached: solo memcached
+            local+memcached: la local delante de memcached
+    """
+    backend = config['CACHE_BACKEND']
+    if backend == 'local':
+        return CacheLocal(config['CACHE_LOCAL_BYTES'])
+    remota = CacheMemcached(config['MEMCACHED_SERVIDOR'], config['MEMCACHED_POOL_SIZE'])
+    if backend == 'memcached':
+        return remota
+    if backend == 'local+memcached':
+        # Lo que esta en memcached lo pueden cambiar otros procesos, por eso en la local dura poco
+        return CacheEnNiveles(CacheLocal(config['CACHE_LOCAL_BYTES'], config['CACHE_LOCAL_TTL']), remota)
+    raise ValueError('CACHE_BACKEND desconocido: {}'.format(backend))
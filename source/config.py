@@ -1,9 +1,8 @@
 from flask import Flask
 from flask_cors import CORS
 import os
-from pymemcache.client.base import PooledClient
-
-cache = PooledClient('memcached:11211', max_pool_size=10, encoding="utf-8")
+import multiprocessing
+from caches import crear_cache
 
 app = Flask(__name__)
 CORS(app)
@@ -33,6 +32,98 @@ app.config['POSTULANTES_URL'] = app.config['CARRERAS_URL'] + \
 app.config['MATERIAS_NECESARIAS_URL'] = app.config['PLAN_URL'] + \
     'cantidad-materias-necesarias/'
 app.config['SECRET_KEY'] = 'super-secret'
+# Cantidad de tokens ya verificados que se recuerdan en cada proceso (0: se verifican siempre)
+app.config['JWT_CACHE_TAMANIO'] = int(os.getenv('JWT_CACHE_TAMANIO', 1024))
+
+# Conexiones HTTP al backend
+app.config['HTTP_POOL_SIZE'] = int(os.getenv('HTTP_POOL_SIZE', 10))
+app.config['HTTP_TIMEOUT_CONEXION'] = float(os.getenv('HTTP_TIMEOUT_CONEXION', 3))
+app.config['HTTP_TIMEOUT_LECTURA'] = float(os.getenv('HTTP_TIMEOUT_LECTURA', 60))
+app.config['HTTP_REINTENTOS'] = int(os.getenv('HTTP_REINTENTOS', 2))
+app.config['HTTP_BACKOFF'] = float(os.getenv('HTTP_BACKOFF', 0.2))
+# Tamaño de las partes en que se leen las respuestas grandes
+app.config['HTTP_TAMANIO_CHUNK'] = 64 * 1024
+
+# Cantidad de pedidos al backend que un request puede hacer en paralelo
+app.config['FANOUT_WORKERS'] = int(os.getenv('FANOUT_WORKERS', 8))
+
+# Codificador JSON de las respuestas: json (formato de siempre) u orjson (mas rapido, compacto y con NaN como null)
+app.config['CODIFICADOR_JSON'] = os.getenv('CODIFICADOR_JSON', 'json')
+
+# Mide el tiempo, las filas y los bytes de cada etapa (provider, transformer, manipulator),
+# que se ven en /estadisticas/etapas. Con SERVER_TIMING van tambien en el header Server-Timing
+app.config['METRICAS'] = os.getenv('METRICAS', 'false') != 'false'
+app.config['SERVER_TIMING'] = app.config['METRICAS'] and os.getenv('SERVER_TIMING', 'false') != 'false'
+
+# Cache de los recursos del backend
+app.config['USAR_CACHE'] = os.getenv('USAR_CACHE', 'true') != 'false'
+# Tiempo que cada recurso se considera fresco en cache, en segundos (0: no expira)
+app.config['CACHE_TTL'] = {
+    'default': 60 * 60,
+    'materiascursadas': 60 * 60 * 6,
+    'plan': 60 * 60 * 24 * 7,
+    'materias-necesarias': 60 * 60 * 24 * 7,
+    'alumnos': 60 * 60 * 12,
+    'inscriptos': 60 * 60 * 12,
+    'cursantes': 60 * 60 * 12,
+    'ingresantes': 60 * 60 * 12,
+    'graduados': 60 * 60 * 12,
+    'postulantes': 60 * 60 * 12,
+    'respuestas': 60 * 60,
+}
+# Guarda las respuestas de los endpoints, que se reusan mientras no cambien los datos con los que se
+# calcularon (en test esta desactivado, salvo en los tests que lo prueban)
+app.config['USAR_CACHE_RESPUESTAS'] = app.config['USAR_CACHE'] and os.getenv(
+    'USAR_CACHE_RESPUESTAS', 'false' if os.getenv('STAGE') == 'test' else 'true') != 'false'
+# Pasado su TTL, un valor se sigue sirviendo hasta este tiempo mas mientras se revalida en segundo plano
+app.config['CACHE_TTL_VENCIDO'] = int(os.getenv('CACHE_TTL_VENCIDO', 60 * 60))
+# Si una revalidacion tarda mas que esto, otro proceso puede intentarla
+app.config['CACHE_TIMEOUT_REVALIDACION'] = 5 * 60
+# Cuando un valor no esta en cache lo trae del backend un solo proceso, y los demas lo esperan
+# en cache hasta este tiempo (si no aparece, lo traen ellos)
+app.config['CACHE_TIMEOUT_CARGA'] = int(os.getenv('CACHE_TIMEOUT_CARGA', 60))
+# Al revalidar las materias cursadas se piden al backend solo los registros desde la ultima
+# fecha que ya esta en cache, y se agregan al dataset. Con false se vuelven a traer enteras
+app.config['MATERIASCURSADAS_INCREMENTAL'] = os.getenv('MATERIASCURSADAS_INCREMENTAL', 'true') != 'false'
+# Tamaño maximo de cada parte de un valor binario en cache (memcached limita los items a 1 MB)
+app.config['CACHE_TAMANIO_PARTE'] = 1000 * 1000 - 1024
+# Donde se guarda la cache: local, memcached o local+memcached (en test, solo local)
+app.config['CACHE_BACKEND'] = os.getenv(
+    'CACHE_BACKEND', 'local' if os.getenv('STAGE') == 'test' else 'local+memcached')
+app.config['MEMCACHED_SERVIDOR'] = os.getenv('MEMCACHED_SERVIDOR', 'memcached:11211')
+app.config['MEMCACHED_POOL_SIZE'] = 10
+# Tamaño maximo de la cache local de cada proceso, en bytes
+app.config['CACHE_LOCAL_BYTES'] = int(os.getenv('CACHE_LOCAL_BYTES', 256 * 1024 * 1024))
+# Segundos que dura en la cache local lo que se trajo de memcached
+app.config['CACHE_LOCAL_TTL'] = int(os.getenv('CACHE_LOCAL_TTL', 30))
+
+cache = crear_cache(app.config)
+
+# Servidor de produccion (modo production)
+app.config['WSGI_BIND'] = os.getenv('WSGI_BIND', '0.0.0.0:5000')
+# Los endpoints pesados son CPU (pandas), asi que por defecto un worker por core
+app.config['WSGI_WORKERS'] = int(os.getenv('WSGI_WORKERS', multiprocessing.cpu_count()))
+app.config['WSGI_THREADS'] = int(os.getenv('WSGI_THREADS', 4))
+app.config['WSGI_TIMEOUT'] = int(os.getenv('WSGI_TIMEOUT', 120))
+# Tiempo que tienen los workers para terminar los requests en curso al apagarse
+app.config['WSGI_GRACEFUL_TIMEOUT'] = int(os.getenv('WSGI_GRACEFUL_TIMEOUT', 30))
+
+# Pool de procesos para los calculos pesados (0: se calculan en el thread del request)
+app.config['PROCESOS_WORKERS'] = int(os.getenv('PROCESOS_WORKERS', 0))
+# Cuantos calculos pueden esperar en el pool, ademas de los que estan corriendo
+app.config['PROCESOS_COLA'] = int(os.getenv('PROCESOS_COLA', 8))
+# Segundos que un request espera su calculo
+app.config['PROCESOS_TIMEOUT'] = float(os.getenv('PROCESOS_TIMEOUT', 60))
+# Con menos filas que esto, mandar el DataFrame al pool cuesta mas que calcularlo
+app.config['PROCESOS_MIN_FILAS'] = int(os.getenv('PROCESOS_MIN_FILAS', 5000))
+
+# Snapshots de las carreras ya preparados en memoria (en test se construyen a mano)
+app.config['USAR_SNAPSHOTS'] = os.getenv(
+    'USAR_SNAPSHOTS', 'false' if os.getenv('STAGE') == 'test' else 'true') != 'false'
+# Cada cuantos segundos se revisa si hay que reconstruir los snapshots
+app.config['SNAPSHOT_INTERVALO'] = int(os.getenv('SNAPSHOT_INTERVALO', 5 * 60))
 
-app.config['USERNAME'] = ''
-app.config['PASSWORD'] = ''
+# Usuario de servicio con el que se refrescan los snapshots. Sin usuario se usa el token
+# del ultimo request que los pidio, que deja de servir cuando vence
+app.config['USERNAME'] = os.getenv('SERVICIO_USUARIO', '')
+app.config['PASSWORD'] = os.getenv('SERVICIO_PASSWORD', '')
@@ -1,16 +1,57 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 import functools
-from flask import abort, request
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from datetime import date
+from concurrent.futures import ThreadPoolExecutor
+from flask import abort, request, g, has_request_context, copy_current_request_context, make_response
 import jwt
-from config import app
+from config import app, cache
 from provider import DataProvider
 
+_executor = None
+_executor_lock = threading.Lock()
+
+# Tokens ya verificados: {digest del token: (exp, payload, carreras permitidas)}
+_tokens = OrderedDict()
+_tokens_lock = threading.Lock()
+
 
 def get_token(request):
     return request.headers.get('Authorization').split('Bearer ')[1]
 
 
+def verificar_token(token):
+    """
+        Decodifica y verifica el token, y guarda su payload y sus carreras para no volver
+        a verificarlo en los requests siguientes hasta que venza (exp).
+        Solo se guardan los tokens validos, a lo sumo JWT_CACHE_TAMANIO, descartando
+        los usados hace mas tiempo. El payload se comparte, no hay que modificarlo
+        :return (payload, frozenset de las carreras permitidas)
+    """
+    clave = hashlib.sha256(token.encode('utf8')).digest()
+    with _tokens_lock:
+        guardado = _tokens.get(clave)
+        if guardado is not None:
+            if guardado[0] is None or time.time() < guardado[0]:
+                _tokens.move_to_end(clave)
+                return guardado[1], guardado[2]
+            del _tokens[clave]
+
+    payload = jwt.decode(token, app.config['SECRET_KEY'], algorithms=['HS256'])
+    permitidas = frozenset(payload['carreras'])
+    if app.config['JWT_CACHE_TAMANIO']:
+        with _tokens_lock:
+            _tokens[clave] = (payload.get('exp'), payload, permitidas)
+            while len(_tokens) > app.config['JWT_CACHE_TAMANIO']:
+                _tokens.popitem(last=False)
+    return payload, permitidas
+
+
 def tiene_jwt(f):
     @functools.wraps(f)
     def decorated_function(*args, **kwargs):
@@ -20,18 +61,164 @@ def tiene_jwt(f):
                 # Pido el token del request
                 token = get_token(request)
                 # Traigo el payload del token
-                payload = jwt.decode(
-                    token, app.config['SECRET_KEY'], algorithms=['HS256'])
+                payload, permitidas = verificar_token(token)
                 # Pido las carreras del request
                 carreras_str = request.args.get('carreras')
                 carreras = carreras_str.split(',') if carreras_str else []
                 # Chequeo que las carreras pedidas sean un subset de sus permisos
-                if not set(carreras) <= set(payload['carreras']):
+                if not permitidas.issuperset(carreras):
                     abort(401, 'El token es invalido')
+                g.payload = payload
             except:
                 abort(401, 'El token es invalido')
         else:
             abort(401, 'Se necesita un token')
         return f(*args, **kwargs)
     return decorated_function
-    
\ No newline at end of file
+
+
+def memoizado_en_request(recurso):
+    """
+        Memoiza el resultado de la funcion en el contexto del request (flask.g),
+        con clave (recurso, *args). Asi un mismo request no pide ni transforma
+        dos veces el mismo recurso.
+        Los resultados se comparten, por lo que no hay que modificarlos in place
+    """
+    def decorator(f):
+        @functools.wraps(f)
+        def decorated_function(*args):
+            # Fuera de un request no hay donde memoizar
+            if not has_request_context():
+                return f(*args)
+            if 'memo' not in g:
+                g.memo = {}
+            clave = (recurso,) + args
+            if clave not in g.memo:
+                g.memo[clave] = f(*args)
+            return g.memo[clave]
+        return decorated_function
+    return decorator
+
+
+def get_executor():
+    """
+        Pool de threads compartido para hacer en paralelo los pedidos al backend
+    """
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=app.config['FANOUT_WORKERS'])
+    return _executor
+
+
+def en_paralelo(*funciones):
+    """
+        Ejecuta funciones independientes entre si (sin argumentos) en paralelo
+        y retorna sus resultados en el mismo orden.
+        Cada funcion corre con una copia del contexto del request, compartiendo
+        la memoizacion de memoizado_en_request, por lo que puede usar request y g.
+        No se debe llamar desde una de las funciones que ya corren en paralelo
+    """
+    if not has_request_context():
+        futuros = [get_executor().submit(funcion) for funcion in funciones]
+        return [futuro.result() for futuro in futuros]
+
+    if 'memo' not in g:
+        g.memo = {}
+    memo = g.memo
+    versiones = g.get('versiones')
+    etapas = g.get('etapas')
+
+    def en_contexto(funcion):
+        @copy_current_request_context
+        def ejecutar():
+            g.memo = memo
+            if versiones is not None:
+                g.versiones = versiones
+            if etapas is not None:
+                g.etapas = etapas
+            return funcion()
+        return ejecutar
+
+    futuros = [get_executor().submit(en_contexto(funcion))
+               for funcion in funciones]
+    return [futuro.result() for futuro in futuros]
+
+
+def clave_respuesta():
+    """
+        Clave de la respuesta del request: la ruta, los argumentos, el header Accept (que puede
+        elegir el formato), las carreras del token y el dia, porque algunas respuestas dependen de la fecha de hoy
+    """
+    clave = json.dumps([request.path, sorted(request.args.items(multi=True)), request.headers.get('Accept'),
+                        sorted(g.payload['carreras']), date.today().isoformat()])
+    return 'respuesta:' + hashlib.sha1(clave.encode('utf8')).hexdigest()
+
+
+def get_respuesta_guardada(clave):
+    """
+        La respuesta guardada, si todos los datos con los que se calculo siguen
+        teniendo la misma version en cache
+        :return {'etag', 'versiones', 'cuerpo', 'headers'} o None
+    """
+    provider = DataProvider()
+    guardada = cache.get(clave)
+    if not guardada:
+        return None
+    guardada = json.loads(guardada)
+    if provider.get_versiones(guardada['versiones']) != guardada['versiones']:
+        return None
+    return guardada
+
+
+def respuesta_cacheada(f):
+    """
+        Guarda la respuesta del endpoint con un ETag, y la reusa mientras no cambie la version
+        en cache de ninguno de los datos que uso. Si el ETag coincide con el If-None-Match
+        del request responde 304 sin cuerpo.
+        Va despues de tiene_jwt, y solo se guardan las respuestas 200 de requests en los que
+        todos los datos salieron de la cache
+    """
+    @functools.wraps(f)
+    def decorated_function(*args, **kwargs):
+        if not app.config['USAR_CACHE_RESPUESTAS']:
+            return f(*args, **kwargs)
+        provider = DataProvider()
+        clave = clave_respuesta()
+        guardada = get_respuesta_guardada(clave)
+        if guardada:
+            if guardada['etag'] in request.if_none_match:
+                return respuesta_no_modificada(guardada['etag'])
+            version, cuerpo = provider.get_cache_binaria(clave + ':cuerpo')
+            if version == guardada['cuerpo']:
+                response = make_response(cuerpo)
+                for header, valor in guardada['headers'].items():
+                    response.headers[header] = valor
+                response.set_etag(guardada['etag'])
+                return response
+
+        g.versiones = {}
+        response = make_response(f(*args, **kwargs))
+        versiones = g.pop('versiones')
+        if response.status_code != 200 or not versiones or None in versiones.values():
+            return response
+        # La clave va en el ETag para que distintas representaciones (Accept, argumentos, dia)
+        # de los mismos datos nunca compartan uno
+        etag = hashlib.sha1(json.dumps([clave, sorted(versiones.items())]).encode('utf8')).hexdigest()
+        cuerpo = provider.set_cache_binaria(clave + ':cuerpo', response.get_data(), 'respuestas')
+        headers = {header: response.headers[header] for header in ('Content-Type', 'Vary') if header in response.headers}
+        provider.set_cache(clave, json.dumps({'etag': etag, 'versiones': versiones, 'cuerpo': cuerpo,
+                                              'headers': headers}).encode('utf8'), 'respuestas')
+        if etag in request.if_none_match:
+            return respuesta_no_modificada(etag)
+        response.set_etag(etag)
+        return response
+    return decorated_function
+
+
+def respuesta_no_modificada(etag):
+    response = make_response('', 304)
+    response.set_etag(etag)
+    return response
@@ -0,0 +1,67 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+from utils import ModuloLazy
+
+np = ModuloLazy('numpy')
+pd = ModuloLazy('pandas')
+
+
+class DataIndexer:
+    """
+        Indice de las filas de un DataFrame por alumno y por codigo de materia.
+        Se construye una sola vez por dataset cargado, y despues traer las filas
+        de un alumno o de una materia cuesta O(k) en lugar de recorrer todo el DataFrame
+    """
+
+    def __init__(self, df, columnas=('alumno', 'codigo')):
+        self.df = df
+        self.indices = {}
+        for columna in columnas:
+            if columna in df.columns:
+                self.indices[columna] = self.indexar(df[columna])
+
+    def indexar(self, serie):
+        """
+            Ordena las posiciones de las filas por valor, de forma estable para mantener
+            el orden original dentro de cada valor, y guarda el rango que ocupa cada valor
+            :return (posiciones ordenadas, {valor: (inicio, fin)})
+        """
+        if isinstance(serie.dtype, pd.CategoricalDtype):
+            codigos = serie.cat.codes.to_numpy()
+            valores = serie.cat.categories
+        else:
+            codigos, valores = pd.factorize(serie)
+        orden = np.argsort(codigos, kind='stable')
+        cantidades = np.bincount(codigos[codigos >= 0], minlength=len(valores))
+        # Los nulos (codigo -1) quedan al principio del orden
+        fines = np.cumsum(cantidades) + np.count_nonzero(codigos < 0)
+        inicios = fines - cantidades
+        rangos = {valor: (inicio, fin)
+                  for valor, inicio, fin in zip(valores, inicios, fines)}
+        return orden, rangos
+
+    def filtrar(self, columna, valor):
+        """
+            Equivale a df.loc[df[columna] == valor], manteniendo el orden y el indice de las filas
+        """
+        orden, rangos = self.indices[columna]
+        inicio, fin = rangos.get(valor, (0, 0))
+        return self.df.iloc[orden[inicio:fin]]
+
+    def filtrar_alumno(self, legajo):
+        return self.filtrar('alumno', legajo)
+
+    def filtrar_materia(self, cod_materia):
+        return self.filtrar('codigo', cod_materia)
+
+    def filtrar_varios(self, columna, valores):
+        """
+            Equivale a df.loc[df[columna].isin(valores)], pero con las filas agrupadas por valor,
+            en el orden en que vienen los valores
+        """
+        orden, rangos = self.indices[columna]
+        posiciones = [orden[inicio:fin] for inicio, fin in (rangos.get(valor, (0, 0)) for valor in valores)]
+        return self.df.iloc[np.concatenate(posiciones) if posiciones else []]
+
+    def filtrar_alumnos(self, legajos):
+        return self.filtrar_varios('alumno', legajos)
@@ -1,8 +1,12 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
-import pandas as pd
-import numpy as np
+from datetime import datetime, timedelta
 from transformer import DataTransformer
+from utils import calcular_score_materia, ModuloLazy
+from metricas import medido
+
+pd = ModuloLazy('pandas')
+np = ModuloLazy('numpy')
 
 
 class DataManipulator:
@@ -26,6 +30,7 @@ class DataManipulator:
                         materia]
         return df
 
+    @medido
     def filtrar_periodo(self, df, fecha_inicio, fecha_fin):
         """
             Se filtra por periodo seleccionado separando los casos correspondientes.
@@ -55,7 +60,7 @@ class DataManipulator:
 
     def filtrar_aprobados(self, df):
         # A: Regular | P: Acredito
-        return df.loc[(df.resultado == 'A') | (df.resultado == 'P')]
+        return df.loc[df.resultado.isin(['A', 'P'])]
 
     def filtrar_ausentes(self, df):
         return df.loc[(df.resultado == 'U')]  # U: Ausente/Libre
@@ -239,6 +244,14 @@ class DataManipulator:
             aprobadas_alumno)
         return cantidad_materias_aprobadas
 
+    def cantidad_aprobadas_por_alumno(self, cursadas):
+        """
+            Igual que cantidad_aprobadas, pero de cada alumno de las cursadas
+            :return Series indexada por alumno
+        """
+        aprobadas = self.filtrar_aprobados(cursadas)
+        return aprobadas.groupby('alumno', observed=True)['codigo'].nunique()
+
     def porcentaje_aprobadas(self, aprobadas, total):
         return (float(aprobadas) / total) * 100
 
@@ -246,30 +259,60 @@ class DataManipulator:
         """
             Precondicion: se asume que las materias ya vienen filtradas por alumno/s
         """
-        areas = self.areas_unicas(plan_data)
-        result = {}
-        for area in areas:
-            # Si no tiene seteada el Área, no me interesa
-            if area:
-                result[area] = self.porcentaje_aprobadas_area(
-                    plan_data, cursadas_data, area)
-        return result
+        return self.porcentajes_aprobadas_de_cursadas(plan_data, cursadas_data, 'area')
 
     def porcentajes_aprobadas_nucleos(self, plan_data, cursadas_data):
         """
             Precondicion: se asume que las materias ya vienen filtradas por alumno/s
         """
-        nucleos = self.nucleos_unicos(plan_data)
-        result = {}
-        for nucleo in nucleos:
-            # Si no tiene seteada el Área, no me interesa
-            if nucleo:
-                result[nucleo] = self.porcentaje_aprobadas_nucleo(
-                    plan_data, cursadas_data, nucleo)
-        return result
+        return self.porcentajes_aprobadas_de_cursadas(plan_data, cursadas_data, 'nucleo')
+
+    def porcentajes_aprobadas_de_cursadas(self, plan_data, cursadas_data, columna):
+        """
+            Calcula una sola fila de la matriz, tomando todas las cursadas como de un mismo alumno
+        """
+        matriz = self.matriz_porcentajes_aprobadas(
+            plan_data, cursadas_data.assign(alumno=0), columna, alumnos=[0])
+        return self.porcentajes_alumno(matriz, 0)
+
+    @medido
+    def matriz_porcentajes_aprobadas(self, plan_data, cursadas_data, columna, alumnos=None):
+        """
+            Tabla alumno x area (o nucleo) con el porcentaje de materias aprobadas de cada una.
+            Es lo mismo que porcentaje_aprobadas_area/nucleo para cada alumno y cada valor,
+            pero contando las materias de todos en una sola pasada
+            Las columnas sin materias en el plan quedan en NaN
+            :param columna: 'area' o 'nucleo'. En las areas solo se cuentan las obligatorias
+            :param alumnos: filas de la tabla, por defecto los alumnos de las cursadas
+        """
+        # Si no tiene seteada el Área/Nucleo, no me interesa
+        claves = [clave for clave in pd.unique(plan_data[columna]) if clave]
+        if alumnos is None:
+            alumnos = pd.unique(cursadas_data['alumno'])
+        if columna == 'area':
+            plan_data = self.filtrar_materias_obligatorias(plan_data)
+            cursadas_data = self.filtrar_materias_obligatorias(cursadas_data)
+
+        # Materias distintas del plan, y materias distintas aprobadas por cada alumno
+        totales = plan_data.groupby(columna, sort=False)['codigo'].nunique()
+        aprobadas = self.filtrar_aprobados(cursadas_data).groupby(
+            ['alumno', columna], observed=True)['codigo'].nunique().unstack(columna)
+        # Si el legajo es categorico, lo paso a sus valores para poder reindexar
+        aprobadas.index = aprobadas.index.astype(object)
+        aprobadas = aprobadas.reindex(index=alumnos, columns=claves).fillna(0)
+
+        return aprobadas.div(totales.reindex(claves).replace(0, np.nan), axis=1) * 100
+
+    def porcentajes_alumno(self, matriz, alumno):
+        """
+            Fila de un alumno de matriz_porcentajes_aprobadas, como {area: porcentaje}
+        """
+        return {clave: 0 if pd.isna(valor) else valor for clave, valor in matriz.loc[alumno].items()}
 
     def cantidades_formas_aprobacion(self, df):
-        return df['forma_aprobacion'].value_counts()
+        cantidades = df['forma_aprobacion'].value_counts()
+        # Si la columna es categorica, value_counts incluye las categorias sin apariciones
+        return cantidades[cantidades > 0]
 
     def agrupar_periodo(self, df, fecha, periodo):
         # Saco los que no tienen fecha de inscripcion
@@ -290,7 +333,6 @@ class DataManipulator:
         """
             Dada una fecha, retorno la misma fecha del año anterior
         """
-        from datetime import datetime, timedelta
         return (datetime.strptime(fecha, '%Y-%m-%d') - timedelta(days=365)).strftime('%Y-%m-%d')
 
     def materias_alumno_hasta(self, df, alumno, fecha):
@@ -342,21 +384,47 @@ class DataManipulator:
             df, row.alumno, row.fecha_periodo)
         return row
 
+    @medido
     def aplicar_periodos(self, df):
-        return df.apply(self.row_periodos, axis=1)
+        """
+            Calcula fecha_periodo y periodo_semestre para toda la columna de fechas
+            de una sola vez, en lugar de hacerlo fila por fila con row_periodos
+        """
+        transformer = DataTransformer()
+        df = df.copy()
+        df['fecha_periodo'] = transformer.fechas_periodo(df.fecha)
+        df['periodo_semestre'] = transformer.periodos_semestre(
+            df['fecha_periodo'])
+        return df
 
+    @medido
     def aplicar_scores(self, df):
-        return df.apply(self.row_score_periodo, args=(df, 2), axis=1)
+        """
+            Calcula el score_periodo de cada (alumno, fecha_periodo) con una sola agregacion
+            agrupada y lo replica en cada fila del grupo.
+            Es equivalente a aplicar row_score_periodo fila por fila, pero en tiempo casi lineal
+        """
+        df = df.copy()
+        df['score_periodo'] = df.groupby(['alumno', 'fecha_periodo'], observed=True)[
+            'nota'].transform('mean')
+        return df
 
+    @medido
     def recalcular_notas_faltantes(self, df):
-        df.loc[df.nota == 'A', 'nota'] = 7
-        df.loc[df.nota == 'R', 'nota'] = 3
+        """
+            Deja la columna nota como float, usando nota_numerica si ya fue calculada
+            (A: 7, R: 3, ausentes: 1) y descarta las pendientes de aprobacion
+        """
         # No me interesan los pendientes de aprobacion
         df = df.loc[df.nota != 'PA']
-        df['nota'] = df.nota.replace("", np.nan)
-        df = df.fillna(value=1)  # Lleno los austenes con un 1
-        df.nota = df.nota.astype(float)
-        return df
+        if 'nota_numerica' in df.columns:
+            notas = df['nota_numerica']
+        else:
+            notas = DataTransformer().transform_notas_to_float(df['nota'])
+        # Lleno los austenes con un 1. Las columnas categoricas y de fechas no se completan
+        df = df.fillna(value={columna: 1 for columna in df.columns
+                              if df[columna].dtype == object or pd.api.types.is_numeric_dtype(df[columna])})
+        return df.assign(nota=notas.fillna(1))
 
     def scores_periodos(self, df):
         """
@@ -398,6 +466,7 @@ class DataManipulator:
             df, legajo)
         return self.get_scores_periodos(materias_alumno)
 
+    @medido
     def get_scores_periodos(self, df):
         """
             Calcula los scores por períodos
@@ -424,7 +493,8 @@ class DataManipulator:
         # Merge por alumno y codigo
         merge_df = pd.merge(inscriptos_df, cursadas_df,
                             on=['alumno', 'codigo'])
-        recursantes = merge_df['alumno'].value_counts().to_dict()
+        recursantes = merge_df['alumno'].value_counts()
+        recursantes = recursantes[recursantes > 0].to_dict()
         return recursantes
 
     # ------ Materias traba
@@ -458,31 +528,46 @@ class DataManipulator:
 
     def transformar_aprobados_desaprobados(self, df):
         # Los que dicen P los tranformo en A para poder agrupar los aprobados
-        df.loc[df.resultado == 'P', 'resultado'] = 'A'
-        # Los que dicen U los tranformo en R para poder agrupar los aprobados
-        df.loc[df.resultado == 'U', 'resultado'] = 'R'
-        # Los que dicen U los tranformo en R para poder agrupar los aprobados
-        df.loc[df.resultado == '', 'resultado'] = 'R'
+        # Los que dicen U o vacio los tranformo en R para poder agrupar los desaprobados
+        # Con map, si la columna es categorica se reemplazan solo las categorias
+        reemplazos = {'P': 'A', 'U': 'R', '': 'R'}
+        df = df.assign(resultado=df.resultado.map(
+            lambda resultado: reemplazos.get(resultado, resultado)))
         df = df.loc[df.nota != 'PA']  # Descarto las pendientes
         return df
 
     def contar_aprobados_desaprobados(self, df):
-        return df.groupby(['codigo', 'resultado', 'cantidad_obligatoria_de', 'materia']).size().reset_index(name='cantidad')
+        return df.groupby(['codigo', 'resultado', 'cantidad_obligatoria_de', 'materia'], observed=True).size().reset_index(name='cantidad')
 
     def row_totales_aprobados_desaprobados(self, row, df, x):
         row['indice_aprobacion'] = self.indice_aprobacion(df, row.codigo)
         return row
 
-    def calcular_totales_aprobados_desaprobados(self):
-        df = df.apply(self.row_totales_aprobados_desaprobados,
-                      args=(df, 2), axis=1)
+    def calcular_totales_aprobados_desaprobados(self, df):
+        """
+            Calcula el indice de aprobacion de todas las materias a la vez,
+            pivoteando las cantidades de aprobados y desaprobados por codigo.
+            Se asume que ya vienen agrupadas con contar_aprobados_desaprobados
+            :return Dataframe con una fila por materia
+        """
+        cantidades = df.groupby(['codigo', 'resultado'], observed=True)[
+            'cantidad'].first().unstack(fill_value=0)
+        # Puede no haber columna de aprobados o de desaprobados, por ejemplo si todas estan pendientes
+        cantidades = cantidades.reindex(columns=['A', 'R'], fill_value=0)
+        aprobados = cantidades['A']
+        desaprobados = cantidades['R']
+        total = aprobados + desaprobados
+        # Si no hay aprobados ni desaprobados, el indice es 0
+        indices = (aprobados * 100 / total.where(total > 0)).fillna(0)
         df = df.drop_duplicates(subset=['codigo'], keep='first')
+        df = df.assign(indice_aprobacion=df['codigo'].map(indices))
         return df
 
+    @medido
     def calcular_materias_traba(self, df):
         df = self.transformar_aprobados_desaprobados(df)
         df = self.contar_aprobados_desaprobados(df)
-        df = df.apply(self.row_totales_aprobados_desaprobados,
-                      args=(df, 2), axis=1)
-        df = df.drop_duplicates(subset=['codigo'], keep='first')
+        df = self.calcular_totales_aprobados_desaprobados(df)
+        df['score'] = calcular_score_materia(
+            df['cantidad_obligatoria_de'], df['indice_aprobacion'])
         return df
@@ -0,0 +1,98 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import functools
+import threading
+import time
+from flask import g, has_request_context
+from config import app
+from utils import ModuloLazy
+
+pd = ModuloLazy('pandas')
+
+# Totales del proceso por etapa: {nombre: {'veces', 'segundos', 'filas_entrada', 'filas_salida', 'bytes'}}
+_totales = {}
+_lock = threading.Lock()
+
+
+def activas():
+    return app.config['METRICAS']
+
+
+def contar_filas(valor):
+    """
+        Filas del DataFrame, o del ultimo DataFrame de una tupla como (version, DataFrame)
+        None si no hay ninguno
+    """
+    if isinstance(valor, tuple):
+        valor = next((v for v in reversed(valor) if isinstance(v, pd.DataFrame)), None)
+    return len(valor) if isinstance(valor, pd.DataFrame) else None
+
+
+def registrar(nombre, segundos, filas_entrada=None, filas_salida=None, bytes_leidos=0):
+    """
+        Suma una ejecucion de la etapa a los totales del proceso, y a las del request en curso
+    """
+    with _lock:
+        total = _totales.setdefault(nombre, {'veces': 0, 'segundos': 0.0, 'filas_entrada': 0,
+                                             'filas_salida': 0, 'bytes': 0})
+        total['veces'] += 1
+        total['segundos'] += segundos
+        total['filas_entrada'] += filas_entrada or 0
+        total['filas_salida'] += filas_salida or 0
+        total['bytes'] += bytes_leidos
+    if has_request_context() and 'etapas' in g:
+        g.etapas.append((nombre, segundos))
+
+
+def medido(f):
+    """
+        Mide cada llamada a la funcion como una etapa, con nombre modulo.funcion:
+        el tiempo, las filas del primer DataFrame que recibe y las del que retorna.
+        Con METRICAS desactivado solo agrega un chequeo por llamada
+    """
+    nombre = '{}.{}'.format(f.__module__, f.__name__)
+
+    @functools.wraps(f)
+    def decorated_function(*args, **kwargs):
+        if not app.config['METRICAS']:
+            return f(*args, **kwargs)
+        inicio = time.perf_counter()
+        resultado = f(*args, **kwargs)
+        segundos = time.perf_counter() - inicio
+        entrada = next((arg for arg in args if isinstance(arg, pd.DataFrame)), None)
+        registrar(nombre, segundos, contar_filas(entrada), contar_filas(resultado))
+        return resultado
+    return decorated_function
+
+
+def contar_bytes(nombre, chunks):
+    """
+        Deja pasar los chunks de una respuesta que se lee de a partes, y al terminar registra
+        la etapa con los bytes leidos. El tiempo va desde el primer chunk pedido hasta el
+        ultimo, por lo que incluye lo que tarda en procesarlos quien los consume
+    """
+    inicio = time.perf_counter()
+    leidos = 0
+    try:
+        for chunk in chunks:
+            leidos += len(chunk)
+            yield chunk
+    finally:
+        registrar(nombre, time.perf_counter() - inicio, bytes_leidos=leidos)
+
+
+def estadisticas():
+    with _lock:
+        return {nombre: dict(total) for nombre, total in _totales.items()}
+
+
+def server_timing(etapas, total):
+    """
+        Valor del header Server-Timing: el tiempo de cada etapa del request (sumando
+        las que se ejecutaron varias veces) y el total, en milisegundos
+    """
+    duraciones = {}
+    for nombre, segundos in etapas:
+        duraciones[nombre] = duraciones.get(nombre, 0) + segundos
+    duraciones['total'] = total
+    return ', '.join('{};dur={:.2f}'.format(nombre, segundos * 1000) for nombre, segundos in duraciones.items())
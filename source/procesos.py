@@ -0,0 +1,98 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from flask import abort
+from config import app
+from transformer import DataTransformer
+from manipulator import DataManipulator
+from metricas import medido
+
+# Calculos de DataManipulator que se pueden mandar al pool, que reciben un DataFrame y retornan otro,
+# con las columnas que usan. Solo esas columnas se mandan al pool
+METODOS = {
+    'get_scores_periodos': ('alumno', 'fecha', 'nota', 'nota_numerica'),
+    'calcular_materias_traba': ('codigo', 'materia', 'resultado', 'nota', 'cantidad_obligatoria_de'),
+}
+
+_pool = None
+_cupos = None
+_lock = threading.Lock()
+
+
+def get_pool():
+    """
+        Pool de procesos para los calculos pesados, y los cupos que limitan cuantos
+        calculos puede haber en el pool (corriendo o esperando) a la vez.
+        Los procesos se crean con spawn, porque forkear un servidor con threads no es seguro
+    """
+    global _pool, _cupos
+    with _lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=app.config['PROCESOS_WORKERS'],
+                                        mp_context=multiprocessing.get_context('spawn'))
+            _cupos = threading.BoundedSemaphore(app.config['PROCESOS_WORKERS'] + app.config['PROCESOS_COLA'])
+    return _pool, _cupos
+
+
+def descartar_pool(pool):
+    global _pool
+    with _lock:
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False)
+
+
+def calcular_serializado(metodo, data, args):
+    """
+        Corre en el proceso del pool. El DataFrame va y vuelve en el formato binario
+        columnar del transformer, que es mucho mas chico que un DataFrame pickleado
+    """
+    transformer = DataTransformer()
+    df = transformer.transform_bytes_to_dataframe(data)
+    resultado = getattr(DataManipulator(), metodo)(df, *args)
+    return transformer.transform_dataframe_to_bytes(resultado)
+
+
+@medido
+def calcular(metodo, df, *args, conservar=()):
+    """
+        Retorna DataManipulator().metodo(df, *args), calculado en el pool de procesos para
+        no tomar el GIL del worker mientras atiende otros requests.
+        El calculo recibe solo las columnas que usa, mas las de conservar, que son
+        las que el request necesita que vuelvan en el resultado
+        Si el pool esta deshabilitado, o el DataFrame es chico y no vale la pena mandarlo,
+        se calcula en el mismo thread.
+        Si el pool ya tiene todos sus cupos ocupados responde 503, y si el calculo
+        tarda mas que PROCESOS_TIMEOUT responde 504
+        El resultado vuelve con un indice nuevo (0..n-1)
+    """
+    if metodo not in METODOS:
+        raise ValueError('{} no se puede calcular en el pool'.format(metodo))
+    df = df[[columna for columna in df.columns if columna in METODOS[metodo] or columna in conservar]]
+    if not app.config['PROCESOS_WORKERS'] or len(df) < app.config['PROCESOS_MIN_FILAS']:
+        return getattr(DataManipulator(), metodo)(df, *args)
+
+    transformer = DataTransformer()
+    pool, cupos = get_pool()
+    if not cupos.acquire(blocking=False):
+        abort(503, 'No hay lugar para mas calculos, reintentar mas tarde')
+    try:
+        futuro = pool.submit(calcular_serializado, metodo,
+                             transformer.transform_dataframe_to_bytes(df), args)
+    except BrokenProcessPool:
+        cupos.release()
+        descartar_pool(pool)
+        abort(503, 'Se reinicio el pool de calculos, reintentar')
+    # El cupo se libera cuando el calculo termina de verdad, aunque el request ya no lo espere
+    futuro.add_done_callback(lambda _: cupos.release())
+    try:
+        return transformer.transform_bytes_to_dataframe(
+            futuro.result(timeout=app.config['PROCESOS_TIMEOUT']))
+    except TimeoutError:
+        abort(504, 'El calculo tardo demasiado')
+    except BrokenProcessPool:
+        descartar_pool(pool)
+        abort(503, 'Se reinicio el pool de calculos, reintentar')
@@ -1,19 +1,267 @@
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import json
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from flask import g, has_request_context
 from config import app, cache
 import os
+import uuid
+from urllib.parse import quote
 from transformer import DataTransformer
+from indexer import DataIndexer
+import metricas
+from metricas import medido
+
+_session = None
+_session_lock = threading.Lock()
+
+# Indices de los datasets de materias cursadas ya cargados en este proceso
+# {clave de cache: (version del dataset en cache, DataIndexer)}
+_indexers = {}
+
+# Pedidos al backend en curso, para que los threads que piden lo mismo esperen el mismo resultado
+# {clave de cache: Future}
+_en_vuelo = {}
+_en_vuelo_lock = threading.Lock()
+
+_revalidaciones = None
+_revalidaciones_lock = threading.Lock()
+
+
+def get_session():
+    """
+        Retorna la sesion HTTP compartida por todos los DataProvider.
+        Mantiene un pool de conexiones keep-alive al backend y reintenta
+        con backoff los GET que fallan por conexion o por errores 502/503/504
+    """
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                reintentos = Retry(total=app.config['HTTP_REINTENTOS'],
+                                   backoff_factor=app.config['HTTP_BACKOFF'],
+                                   status_forcelist=(502, 503, 504),
+                                   raise_on_status=False)
+                adapter = HTTPAdapter(pool_connections=app.config['HTTP_POOL_SIZE'],
+                                      pool_maxsize=app.config['HTTP_POOL_SIZE'],
+                                      max_retries=reintentos)
+                session = requests.Session()
+                session.mount('http://', adapter)
+                session.mount('https://', adapter)
+                _session = session
+    return _session
+
+
+def una_sola_vez(clave, traer):
+    """
+        Llama a traer, salvo que otro thread ya la este llamando para la misma clave:
+        en ese caso espera y retorna el mismo resultado (o la misma excepcion).
+        Asi cuando una clave no esta en cache, se va una sola vez al backend
+    """
+    with _en_vuelo_lock:
+        futuro = _en_vuelo.get(clave)
+        propio = futuro is None
+        if propio:
+            futuro = _en_vuelo[clave] = Future()
+    if not propio:
+        return futuro.result()
+    try:
+        resultado = traer()
+        futuro.set_result(resultado)
+        return resultado
+    except BaseException as error:
+        futuro.set_exception(error)
+        raise
+    finally:
+        with _en_vuelo_lock:
+            del _en_vuelo[clave]
+
+
+def una_sola_vez_entre_procesos(clave, traer, leer):
+    """
+        Como una_sola_vez, pero tambien entre procesos: trae el valor solo quien toma el lock
+        en cache, y los demas esperan a que aparezca en cache (leer retorna None mientras no este).
+        Si el que tenia el lock lo libera sin dejar el valor, el siguiente que lo toma lo trae,
+        y si pasa CACHE_TIMEOUT_CARGA sin que aparezca, cada uno lo trae por su cuenta
+    """
+    lock = clave + ':trayendo'
+    espera = app.config['CACHE_TIMEOUT_CARGA']
+
+    def traer_con_lock():
+        limite = time.time() + espera
+        while not cache.add(lock, b'1', expire=espera):
+            resultado = leer()
+            if resultado is not None:
+                return resultado
+            if time.time() > limite:
+                return traer()
+            time.sleep(0.1)
+        try:
+            # Quizas otro lo dejo en cache justo antes de liberar el lock
+            resultado = leer()
+            return resultado if resultado is not None else traer()
+        finally:
+            cache.delete(lock)
+    return una_sola_vez(clave, traer_con_lock)
+
+
+def vencio(fresco):
+    """
+        Si paso el TTL de un valor, segun su marca :fresco. Los que no tienen TTL nunca se vencen
+    """
+    return fresco is not None and float(fresco) < time.time()
+
+
+def registrar_version(clave, version):
+    """
+        Anota la version del valor de cache que usa el request en curso, si el request
+        lleva la cuenta (g.versiones), para poder validar su respuesta guardada.
+        None es un valor que no quedo en cache
+    """
+    if has_request_context() and 'versiones' in g:
+        g.versiones[clave] = version
+
+
+def get_executor_revalidaciones():
+    global _revalidaciones
+    with _revalidaciones_lock:
+        if _revalidaciones is None:
+            _revalidaciones = ThreadPoolExecutor(max_workers=2)
+    return _revalidaciones
+
+
+def revalidar(clave, traer):
+    """
+        Vuelve a traer un valor vencido sin que el request lo espere.
+        El lock en cache hace que lo revalide un solo thread de un solo proceso,
+        y si el que lo tomo se muere, vence solo
+    """
+    lock = clave + ':revalidando'
+    if not cache.add(lock, b'1', expire=app.config['CACHE_TIMEOUT_REVALIDACION']):
+        return
+
+    def revalidar_y_liberar():
+        try:
+            una_sola_vez(clave, traer)
+        except Exception:
+            app.logger.exception('No se pudo revalidar %s', clave)
+        finally:
+            cache.delete(lock)
+
+    get_executor_revalidaciones().submit(revalidar_y_liberar)
 
 
 class DataProvider:
 
+    def __init__(self, usar_cache=None):
+        """
+            :usar_cache si es False, siempre se va al backend y no se guarda nada en cache
+        """
+        self.usar_cache = app.config['USAR_CACHE'] if usar_cache is None else usar_cache
+
+    def clave_cache(self, recurso, *args):
+        """
+            Arma la clave de cache de un recurso, con namespace y los parametros del pedido
+            Ej: plan:TEST:2019
+        """
+        return ':'.join([recurso] + [quote(str(arg), safe='') for arg in args])
+
+    def get_cacheado(self, recurso, retrieve, token, *args):
+        """
+            Trae el recurso de la cache, o del backend usando retrieve si no esta
+            Las respuestas vacias o fallidas no se cachean
+            Si el valor en cache esta vencido se sirve igual, y se revalida en segundo plano
+            :return el JSON del recurso ya parseado
+        """
+        return self.get_cacheado_con_version(recurso, retrieve, token, *args)[1]
+
+    @medido
+    def get_cacheado_con_version(self, recurso, retrieve, token, *args):
+        """
+            Igual que get_cacheado, pero retorna tambien la version del valor en cache
+            (None si no quedo en cache)
+            :return (version, JSON del recurso ya parseado)
+        """
+        clave = self.clave_cache(recurso, *args)
+
+        def traer():
+            data = retrieve(token, *args)
+            version = None
+            if data and self.usar_cache:
+                texto = data if isinstance(data, str) else json.dumps(
+                    data, ensure_ascii=False)
+                version = self.set_cache(clave, texto.encode('utf8'), recurso)
+            return version, json.loads(data) if isinstance(data, str) else data
+
+        def leer():
+            """
+                El valor en cache, en el mismo pedido que su version y su marca de fresco
+                :return ((version, JSON) o None si no esta, si esta vencido)
+            """
+            valores = cache.get_many([clave, clave + ':version', clave + ':fresco'])
+            if not valores.get(clave):
+                return None, False
+            version = valores.get(clave + ':version')
+            return ((version.decode('utf8') if version else None, json.loads(valores[clave])),
+                    vencio(valores.get(clave + ':fresco')))
+
+        if not self.usar_cache:
+            return traer()
+        resultado, vencido = leer()
+        if resultado:
+            if vencido:
+                revalidar(clave, traer)
+        else:
+            resultado = una_sola_vez_entre_procesos(clave, traer, lambda: leer()[0])
+        registrar_version(clave, resultado[0])
+        return resultado
+
+    def get_ttl(self, recurso):
+        return app.config['CACHE_TTL'].get(recurso, app.config['CACHE_TTL']['default'])
+
+    def set_cache(self, clave, data, recurso, version=None):
+        """
+            Guarda el valor hasta que venza el TTL del recurso, mas el tiempo que se puede
+            seguir sirviendo vencido mientras se revalida (CACHE_TTL_VENCIDO)
+            Junto al valor se guarda su version, que cambia con cada escritura
+            :version si no se pasa, se genera una nueva
+            :return la version guardada
+        """
+        version = version or uuid.uuid4().hex[:8]
+        valores = {clave: data, clave + ':version': version.encode('utf8')}
+        ttl = self.get_ttl(recurso)
+        if not ttl:
+            cache.set_many(valores, expire=0)
+            return version
+        valores[clave + ':fresco'] = str(time.time() + ttl).encode('utf8')
+        cache.set_many(valores, expire=ttl + app.config['CACHE_TTL_VENCIDO'])
+        return version
+
+    def get_versiones(self, claves):
+        """
+            Versiones actuales de los valores guardados con set_cache (None si no estan)
+            :return {clave: version}
+        """
+        versiones = cache.get_many([clave + ':version' for clave in claves])
+        return {clave: versiones[clave + ':version'].decode('utf8') if versiones.get(clave + ':version') else None
+                for clave in claves}
+
+    def esta_vencido(self, clave):
+        """
+            Si paso el TTL del valor. Los que no tienen TTL nunca se vencen
+        """
+        return vencio(cache.get(clave + ':fresco'))
+
     def retrieve_token(self, **kwargs):
         """
             :kwargs tiene que tener username y password
         """
         token_url = app.config['TOKEN_URL']
-        response = requests.post(token_url,
-                                 data=kwargs)
+        response = get_session().post(token_url, data=kwargs,
+                                      timeout=self.get_timeout())
         if response.status_code == 200:
             data = json.loads(response.text)
             return data['access']
@@ -22,20 +270,30 @@ class DataProvider:
 
     def get_headers(self, token):
         return {'Authorization': 'Bearer ' + token}
+
+    def get_timeout(self):
+        return (app.config['HTTP_TIMEOUT_CONEXION'], app.config['HTTP_TIMEOUT_LECTURA'])
+
+    def request_get(self, url, token):
+        if not metricas.activas():
+            return get_session().get(url, headers=self.get_headers(token), timeout=self.get_timeout())
+        inicio = time.perf_counter()
+        response = get_session().get(url, headers=self.get_headers(token), timeout=self.get_timeout())
+        metricas.registrar('provider.request_get', time.perf_counter() - inicio,
+                           bytes_leidos=len(response.content))
+        return response
         
     def retrieve_alumnos_de_carrera(self, token, carrera):
-        headers = self.get_headers(token)
-        response = requests.get(app.config['ALUMNOS_CARRERA_URL'].format(
-            carrera), headers=headers)
+        response = self.request_get(app.config['ALUMNOS_CARRERA_URL'].format(
+            carrera), token)
         if response.status_code == 200:
             return response.text
         else:
             raise Exception
 
     def retrieve_cantidad_materias_necesarias(self, token, carrera, plan):
-        headers = self.get_headers(token)
-        response = requests.get(app.config['MATERIAS_NECESARIAS_URL'].format(
-            carrera, plan), headers=headers)
+        response = self.request_get(app.config['MATERIAS_NECESARIAS_URL'].format(
+            carrera, plan), token)
         if response.status_code == 200:
             return response.text
         else:
@@ -45,9 +303,8 @@ class DataProvider:
         """
             Trae el plan de estudios pedido desde el backend
         """
-        headers = self.get_headers(token)
-        response = requests.get(app.config['PLAN_URL'].format(
-            carrera, plan), headers=headers)
+        response = self.request_get(app.config['PLAN_URL'].format(
+            carrera, plan), token)
         if response.status_code == 200:
             return response.text
         else:
@@ -57,43 +314,222 @@ class DataProvider:
         """
             Trae las inscripciones desde el backend
         """
-        headers = self.get_headers(token)
         url = app.config['INSCRIPCIONES_URL'].format(carrera)
-        response = requests.get(url + str(anio) + '/' + str(mes) + '/' if anio else url, headers=headers)
+        response = self.request_get(url + str(anio) + '/' + str(mes) + '/' if anio else url, token)
         if response.status_code == 200:
             return response.text
         else:
             raise Exception
 
     def get_materiascursadas(self, token, carrera):
-        cache_data = cache.get(carrera)
-        if cache_data:
-            result = json.loads(cache_data)
+        return self.get_cacheado('materiascursadas', self.retrieve_materiascursadas, token, carrera)
+
+    def get_materiascursadas_dataframe(self, token, carrera):
+        """
+            Trae las materias cursadas ya normalizadas en un DataFrame, con los tipos
+            de DataTransformer.tipos_materiascursadas.
+            En cache se guardan en formato binario columnar, por lo que un hit
+            no necesita parsear JSON ni normalizar
+        """
+        return self.get_materiascursadas_con_version(token, carrera)[1]
+
+    @medido
+    def get_materiascursadas_con_version(self, token, carrera):
+        """
+            Igual que get_materiascursadas_dataframe, pero retorna tambien la version
+            del dataset en cache (None si no quedo en cache)
+            :return (version, DataFrame)
+        """
+        clave = self.clave_cache('materiascursadas-df', carrera)
+        if not self.usar_cache:
+            return self.sincronizar_materiascursadas(token, carrera, completa=True)
+
+        def leer():
+            version, cache_data, vencido = self.leer_cache_binaria(clave)
+            if not cache_data:
+                return None, False
+            return (version, DataTransformer().transform_bytes_to_dataframe(cache_data)), vencido
+
+        resultado, vencido = leer()
+        if resultado:
+            if vencido:
+                revalidar(clave, lambda: self.sincronizar_materiascursadas(token, carrera))
         else:
-            data = self.retrieve_materiascursadas(token, carrera)
-            cache.set(carrera, json.dumps(data, ensure_ascii=False).encode('utf8'))
-            result = data
-        return result
+            resultado = una_sola_vez_entre_procesos(
+                clave, lambda: self.sincronizar_materiascursadas(token, carrera, completa=True), lambda: leer()[0])
+        registrar_version(clave, resultado[0])
+        return resultado
+
+    def revalidar_materiascursadas(self, token, carrera):
+        """
+            Revalida en segundo plano las materias cursadas en cache si estan vencidas,
+            sin leer el dataset. Sirve a quien ya tiene el dataset cargado (como los snapshots)
+            :return la version del dataset en cache (None si no esta)
+        """
+        clave = self.clave_cache('materiascursadas-df', carrera)
+        if not self.usar_cache:
+            return None
+        valores = cache.get_many([clave, clave + ':fresco'])
+        if not valores.get(clave):
+            return None
+        if vencio(valores.get(clave + ':fresco')):
+            revalidar(clave, lambda: self.sincronizar_materiascursadas(token, carrera))
+        return valores[clave].decode('utf8').split(':')[0]
+
+    @medido
+    def sincronizar_materiascursadas(self, token, carrera, completa=False):
+        """
+            Actualiza en cache las materias cursadas de la carrera.
+            La sincronizacion incremental pide al backend solo los registros desde la ultima
+            fecha del dataset en cache (su marca de agua) y los agrega; la completa trae todo de nuevo.
+            Si no hay dataset en cache, o MATERIASCURSADAS_INCREMENTAL es false, siempre es completa.
+            Si el backend no trajo cambios, el dataset se guarda con la misma version, y si el pedido
+            incremental falla queda como estaba
+            :return (version, DataFrame)
+        """
+        transformer = DataTransformer()
+        clave = self.clave_cache('materiascursadas-df', carrera)
+        version, cache_data = None, None
+        if not completa and app.config['MATERIASCURSADAS_INCREMENTAL'] and self.usar_cache:
+            version, cache_data = self.get_cache_binaria(clave)
+        anteriores = transformer.transform_bytes_to_dataframe(cache_data) if cache_data else None
+        fechas = anteriores['fecha'].dropna() if anteriores is not None else None
+
+        if fechas is None or fechas.empty:
+            df = transformer.transform_materiascursadas_registros_to_dataframe(
+                self.retrieve_materiascursadas_registros(token, carrera))
+            version = None
+        else:
+            desde = fechas.max()
+            try:
+                nuevas = transformer.transform_materiascursadas_registros_to_dataframe(
+                    self.retrieve_materiascursadas_registros(token, carrera, desde=desde.strftime('%Y-%m-%d')))
+            except Exception:
+                # Sin una respuesta completa del backend, el dataset en cache queda como estaba
+                app.logger.exception('No se pudieron traer las materias cursadas de %s desde %s', carrera, desde)
+                return version, anteriores
+            df = transformer.actualizar_materiascursadas(anteriores, nuevas, desde)
+            if df is not anteriores:
+                version = None
+
+        if df.empty or not self.usar_cache:
+            return None, df
+        if version:
+            # Sin cambios: se renueva el TTL sin cambiar la version, asi no se descartan indices ni snapshots
+            self.set_cache_binaria(clave, cache_data, 'materiascursadas', version=version)
+        else:
+            version = self.set_cache_binaria(clave, transformer.transform_dataframe_to_bytes(df),
+                                             'materiascursadas')
+        return version, df
+
+    @medido
+    def get_materiascursadas_indexer(self, token, carrera):
+        """
+            Retorna un DataIndexer sobre las materias cursadas de la carrera.
+            Se construye una sola vez por dataset cargado en el proceso, y se descarta
+            junto con el dataset cuando cambia (o expira) su version en cache
+        """
+        clave = self.clave_cache('materiascursadas-df', carrera)
+        if self.usar_cache:
+            local = _indexers.get(clave)
+            if local and local[0] == self.get_version_cache_binaria(clave):
+                registrar_version(clave, local[0])
+                return local[1]
+        version, df = self.get_materiascursadas_con_version(token, carrera)
+        indexer = DataIndexer(df)
+        if version:
+            _indexers[clave] = (version, indexer)
+        else:
+            _indexers.pop(clave, None)
+        return indexer
+
+    def get_version_cache_binaria(self, clave):
+        """
+            Retorna la version del valor guardado con set_cache_binaria, o None si no esta
+        """
+        indice = cache.get(clave)
+        if not indice:
+            return None
+        return indice.decode('utf8').split(':')[0]
+
+    def get_cache_binaria(self, clave):
+        """
+            Lee un valor guardado en partes con set_cache_binaria
+            Si falta alguna de las partes, se toma como que no esta en cache
+            :return (version, valor) o (None, None)
+        """
+        return self.leer_cache_binaria(clave)[:2]
+
+    def leer_cache_binaria(self, clave):
+        """
+            Igual que get_cache_binaria, pero retorna tambien si el valor esta vencido,
+            trayendo su marca de fresco en el mismo pedido que la clave principal
+            :return (version, valor, vencido) o (None, None, False)
+        """
+        valores = cache.get_many([clave, clave + ':fresco'])
+        indice = valores.get(clave)
+        if not indice:
+            return None, None, False
+        version, cantidad = indice.decode('utf8').split(':')
+        claves = ['{}:{}:{}'.format(clave, version, i) for i in range(int(cantidad))]
+        partes = cache.get_many(claves)
+        if len(partes) != len(claves):
+            return None, None, False
+        return version, b''.join(partes[c] for c in claves), vencio(valores.get(clave + ':fresco'))
+
+    def set_cache_binaria(self, clave, data, recurso, version=None):
+        """
+            Guarda un valor binario partido en varias claves, para no superar el tamaño
+            maximo de item de memcached.
+            La clave principal guarda la version y la cantidad de partes, asi una lectura
+            nunca mezcla partes de dos escrituras distintas
+            :version si no se pasa, se genera una nueva
+            :return la version guardada
+        """
+        tamanio = app.config['CACHE_TAMANIO_PARTE']
+        ttl = self.get_ttl(recurso)
+        expire = ttl + app.config['CACHE_TTL_VENCIDO'] if ttl else 0
+        version = version or uuid.uuid4().hex[:8]
+        partes = [data[i:i + tamanio] for i in range(0, len(data), tamanio)]
+        cache.set_many({'{}:{}:{}'.format(clave, version, i): parte for i, parte in enumerate(partes)},
+                       expire=expire)
+        return self.set_cache(clave, '{}:{}'.format(version, len(partes)).encode('utf8'), recurso, version=version)
 
     def retrieve_materiascursadas(self, token, carrera):
         """
             Trae las materias cursadas desde el backend
         """
-        headers = self.get_headers(token)
-        response = requests.get(
-            app.config['MATERIASCURSADAS_URL'].format(carrera), headers=headers)
+        response = self.request_get(
+            app.config['MATERIASCURSADAS_URL'].format(carrera), token)
         if response.status_code == 200:
             return response.json()
         else:
             return []
 
+    def retrieve_materiascursadas_registros(self, token, carrera, desde=None):
+        """
+            Trae las materias cursadas desde el backend como un iterador de registros,
+            leyendo la respuesta de a partes en lugar de cargarla entera en memoria
+            :desde si se pasa (YYYY-MM-DD), solo las de esa fecha en adelante
+        """
+        response = get_session().get(app.config['MATERIASCURSADAS_URL'].format(carrera),
+                                     params={'desde': desde} if desde else None,
+                                     headers=self.get_headers(token), timeout=self.get_timeout(),
+                                     stream=True)
+        with response:
+            if response.status_code != 200:
+                raise Exception
+            chunks = response.iter_content(chunk_size=app.config['HTTP_TAMANIO_CHUNK'])
+            if metricas.activas():
+                chunks = metricas.contar_bytes('provider.retrieve_materiascursadas_registros', chunks)
+            yield from DataTransformer().iterar_json_array(chunks)
+
     def retrieve_cursantes(self, token, carrera, anio=None):
         """
             Trae los cursantes de una carrera
         """
-        headers = self.get_headers(token)
         url = app.config['CURSANTES_URL'].format(carrera) 
-        response = requests.get(url + str(anio) + '/' if anio else url, headers=headers)
+        response = self.request_get(url + str(anio) + '/' if anio else url, token)
         if response.status_code == 200:
             return response.text
         else:
@@ -103,9 +539,8 @@ class DataProvider:
         """
             Trae los ingresantes de una carrera
         """
-        headers = self.get_headers(token)
         url = app.config['INGRESANTES_URL'].format(carrera) 
-        response = requests.get(url + str(anio) + '/' if anio else url, headers=headers)
+        response = self.request_get(url + str(anio) + '/' if anio else url, token)
         if response.status_code == 200:
             return response.text
         else:
@@ -115,9 +550,8 @@ class DataProvider:
         """
             Trae los postulantes de una carrera
         """
-        headers = self.get_headers(token)
         url = app.config['POSTULANTES_URL'].format(carrera) 
-        response = requests.get(url + str(anio) + '/' if anio else url, headers=headers)
+        response = self.request_get(url + str(anio) + '/' if anio else url, token)
         if response.status_code == 200:
             return response.text
         else:
@@ -127,9 +561,8 @@ class DataProvider:
         """
             Trae los graduados historicos de una carrera
         """
-        headers = self.get_headers(token)
         url = app.config['GRADUADOS_URL'].format(carrera) 
-        response = requests.get(url + str(anio) + '/' if anio else url, headers=headers)
+        response = self.request_get(url + str(anio) + '/' if anio else url, token)
         if response.status_code == 200:
             return response.text
         else:
@@ -150,33 +583,28 @@ class DataProvider:
     """
 
     def get_cursantes(self, token, carrera, anio=None):
-        data = self.retrieve_cursantes(token, carrera, anio)
-        return json.loads(data)
+        return self.get_cacheado('cursantes', self.retrieve_cursantes, token, carrera, anio)
 
     def get_ingresantes(self, token, carrera, anio=None):
-        data = self.retrieve_ingresantes(token, carrera, anio)
-        return json.loads(data)
+        return self.get_cacheado('ingresantes', self.retrieve_ingresantes, token, carrera, anio)
 
     def get_postulantes(self, token, carrera, anio=None):
-        data = self.retrieve_postulantes(token, carrera, anio)
-        return json.loads(data)
+        return self.get_cacheado('postulantes', self.retrieve_postulantes, token, carrera, anio)
 
     def get_graduados(self, token, carrera, anio=None):
-        data = self.retrieve_graduados(token, carrera, anio)
-        return json.loads(data)
+        return self.get_cacheado('graduados', self.retrieve_graduados, token, carrera, anio)
 
     def get_inscriptos(self, token, carrera, anio=None, mes=None):
-        data = self.retrieve_inscriptos(token, carrera, anio, mes)
-        return json.loads(data)
+        return self.get_cacheado('inscriptos', self.retrieve_inscriptos, token, carrera, anio, mes)
 
     def get_plan(self, token, carrera, plan):
-        data = self.retrieve_plan(token, carrera, plan)
-        return json.loads(data)
+        return self.get_cacheado('plan', self.retrieve_plan, token, carrera, plan)
+
+    def get_plan_con_version(self, token, carrera, plan):
+        return self.get_cacheado_con_version('plan', self.retrieve_plan, token, carrera, plan)
 
     def get_alumnos_de_carrera(self, token, carrera):
-        data = self.retrieve_alumnos_de_carrera(token, carrera)
-        return json.loads(data)
+        return self.get_cacheado('alumnos', self.retrieve_alumnos_de_carrera, token, carrera)
 
     def get_cantidad_materias_necesarias(self, token, carrera, plan):
-        data = self.retrieve_cantidad_materias_necesarias(token, carrera, plan)
-        return json.loads(data)
\ No newline at end of file
+        return self.get_cacheado('materias-necesarias', self.retrieve_cantidad_materias_necesarias, token, carrera, plan)
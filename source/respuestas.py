@@ -0,0 +1,168 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import json
+from flask import abort, make_response
+from config import app
+from transformer import DataTransformer
+from metricas import medido
+from utils import ModuloLazy
+
+pd = ModuloLazy('pandas')
+
+
+class Crudo(str):
+    """
+        Texto que ya es JSON, y que dumps inserta tal cual
+    """
+
+
+# Modulo orjson una vez importado, o False si no esta instalado
+_orjson = None
+
+
+def get_orjson():
+    """
+        El modulo orjson, o None si no esta instalado (lo avisa en el log la primera vez)
+    """
+    global _orjson
+    if _orjson is None:
+        try:
+            import orjson
+            _orjson = orjson
+        except ImportError:
+            app.logger.warning('CODIFICADOR_JSON es orjson, pero orjson no esta instalado: se usa json')
+            _orjson = False
+    return _orjson or None
+
+
+def get_codificador():
+    """
+        Codificador JSON segun CODIFICADOR_JSON:
+            json: el de la libreria estandar, con el formato de siempre (', ' y ': ')
+            orjson: mucho mas rapido, pero compacto (',' y ':') y con los NaN como null.
+                    Si no esta instalado se usa json
+        :return (funcion que codifica un valor como texto, separador de items, separador de clave)
+    """
+    orjson = get_orjson() if app.config['CODIFICADOR_JSON'] == 'orjson' else None
+    if orjson:
+        opciones = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+        return (lambda valor: orjson.dumps(valor, option=opciones).decode('utf8')), ',', ':'
+    return json.dumps, ', ', ': '
+
+
+def dumps(data):
+    """
+        Serializa la respuesta de un endpoint. Los Crudo se insertan tal cual,
+        tambien como valores de diccionarios anidados (no dentro de listas)
+    """
+    codificar, separador, separador_clave = get_codificador()
+
+    def serializar(valor):
+        if isinstance(valor, Crudo):
+            return valor
+        if isinstance(valor, dict):
+            # Las claves que no son texto se convierten como lo hace json
+            return '{' + separador.join(
+                codificar(clave if isinstance(clave, str) else json.dumps(clave)) + separador_clave + serializar(v)
+                for clave, v in valor.items()) + '}'
+        return codificar(valor)
+    return serializar(data)
+
+
+def codificar_columna(serie, codificar, separador):
+    """
+        Codifica cada valor de la columna como JSON, sin recorrerla fila por fila en Python
+        cuando no hace falta: las columnas numericas se codifican de una sola vez,
+        y las categoricas codificando solo sus categorias
+        :return lista con el texto JSON de cada valor
+    """
+    if isinstance(serie.dtype, pd.CategoricalDtype):
+        # Los faltantes (codigo -1) son NaN, que queda al final
+        categorias = [codificar(valor) for valor in serie.cat.categories.tolist() + [float('nan')]]
+        return [categorias[codigo] for codigo in serie.cat.codes.tolist()]
+    if serie.dtype.kind in 'biuf':
+        # Los numeros en JSON nunca contienen el separador
+        return codificar(serie.tolist())[1:-1].split(separador)
+    return [codificar(valor) for valor in serie.tolist()]
+
+
+@medido
+def registros(df, columnas):
+    """
+        Serializa el DataFrame como una lista JSON de registros, uno por fila,
+        igual que json.dumps([{nombre: fila[columna], ...} for fila in df]) pero sin
+        armar un diccionario por fila
+        Cada valor se toma como el de su columna, por eso el DataFrame no debe ser todo
+        numerico si antes se recorria con iterrows (que pasaba los enteros a float)
+        :columnas diccionario {columna del DataFrame: nombre en el JSON}, en el orden del JSON
+        :return Crudo
+    """
+    if df.empty:
+        return Crudo('[]')
+    codificar, separador, separador_clave = get_codificador()
+    plantilla = '{' + separador.join(
+        codificar(nombre).replace('%', '%%') + separador_clave + '%s' for nombre in columnas.values()) + '}'
+    valores = [codificar_columna(df[columna], codificar, separador) for columna in columnas]
+    return Crudo('[' + separador.join(plantilla % fila for fila in zip(*valores)) + ']')
+
+
+@medido
+def por_columnas(df, columnas):
+    """
+        Serializa el DataFrame como un objeto JSON con un array por columna, que es mucho
+        mas chico que los registros cuando son muchas filas
+        :columnas diccionario {columna del DataFrame: nombre en el JSON}, en el orden del JSON
+        :return Crudo
+    """
+    codificar, separador, separador_clave = get_codificador()
+    return Crudo('{' + separador.join(
+        codificar(nombre) + separador_clave + '[' + separador.join(
+            codificar_columna(df[columna], codificar, separador) if not df.empty else []) + ']'
+        for columna, nombre in columnas.items()) + '}')
+
+
+@medido
+def binario(df, columnas):
+    """
+        Serializa las columnas en el formato binario columnar de DataTransformer.transform_dataframe_to_bytes
+    """
+    return DataTransformer().transform_dataframe_to_bytes(df[list(columnas)].rename(columns=columnas))
+
+
+# Formatos de las respuestas tabulares, y su tipo para el header Accept
+FORMATOS = {
+    'registros': 'application/json',
+    'columnas': 'application/vnd.sadi.columnas+json',
+    'binario': 'application/vnd.sadi.columnas',
+}
+
+
+def get_formato(request):
+    """
+        El formato pedido con el parametro formato, o si no con el header Accept
+        Por defecto, y con cualquier tipo desconocido, son registros
+    """
+    formato = request.args.get('formato')
+    if formato:
+        if formato not in FORMATOS:
+            abort(400, 'Formato desconocido: {}'.format(formato))
+        return formato
+    tipo = request.accept_mimetypes.best_match(list(FORMATOS.values()), default=FORMATOS['registros'])
+    return next(formato for formato, tipo_formato in FORMATOS.items() if tipo_formato == tipo)
+
+
+def tabla(request, df, columnas):
+    """
+        Responde el DataFrame en el formato pedido por el request: registros (el de siempre),
+        columnas (un array JSON por columna) o binario
+        :columnas diccionario {columna del DataFrame: nombre en la respuesta}
+    """
+    formato = get_formato(request)
+    if formato == 'registros':
+        response = make_response(registros(df, columnas))
+    else:
+        serializar = por_columnas if formato == 'columnas' else binario
+        response = make_response(serializar(df, columnas))
+        response.mimetype = FORMATOS[formato]
+    response.vary.add('Accept')
+    return response
@@ -0,0 +1,154 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from config import app
+from provider import DataProvider
+from transformer import DataTransformer
+from manipulator import DataManipulator
+from indexer import DataIndexer
+
+# (carrera, plan) -> Snapshot listo para leer
+_snapshots = {}
+# (carrera, plan) -> ultimo token con el que se pidio, para los refrescos periodicos
+_tokens = {}
+_pendientes = set()
+_lock = threading.Lock()
+_executor = None
+_refresco = None
+
+
+class Snapshot:
+    """
+        Datos de una carrera y plan ya preparados para los requests: las cursadas
+        tipadas y mergeadas con el plan, indexadas por alumno y materia, y con los
+        periodos y scores calculados.
+        Un snapshot no se modifica una vez construido, al refrescar se reemplaza por otro
+    """
+
+    def __init__(self, carrera, plan, version, cursadas, plan_data, version_plan=None):
+        transformer = DataTransformer()
+        manipulator = DataManipulator()
+        self.carrera = carrera
+        self.plan = plan
+        # Version en cache de las cursadas con las que se construyo
+        self.version = version
+        # Versiones en cache de los datos con los que se construyo, para validar respuestas guardadas
+        provider = DataProvider()
+        self.versiones = {provider.clave_cache('materiascursadas-df', carrera): version,
+                          provider.clave_cache('plan', carrera, plan): version_plan}
+        self.cursadas = cursadas
+        self.plan_data = plan_data
+        self.indexer_cursadas = DataIndexer(cursadas, columnas=('alumno',))
+        self.merged = transformer.merge_materias_con_plan(cursadas, plan_data)
+        self.indexer = DataIndexer(self.merged)
+        self.scores = manipulator.get_scores_periodos(self.merged)
+        self.indexer_scores = DataIndexer(self.scores, columnas=('alumno',))
+        self.creado = time.time()
+
+
+def get_snapshot(carrera, plan):
+    return _snapshots.get((carrera, plan))
+
+
+def construir_snapshot(token, carrera, plan):
+    """
+        Construye el snapshot de la carrera y plan, y reemplaza al anterior.
+        Los requests que estaban leyendo el anterior lo siguen teniendo completo
+    """
+    provider = DataProvider()
+    version, cursadas = provider.get_materiascursadas_con_version(token, carrera)
+    version_plan, plan_json = provider.get_plan_con_version(token, carrera, plan)
+    snapshot = Snapshot(carrera, plan, version, cursadas,
+                        DataTransformer().transform_to_dataframe(plan_json), version_plan)
+    _snapshots[(carrera, plan)] = snapshot
+    return snapshot
+
+
+def get_executor():
+    """
+        Un solo thread construye los snapshots, para no competir con los requests
+    """
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=1)
+    return _executor
+
+
+def recordar_token(token, carrera, plan):
+    """
+        Guarda el token del ultimo request que uso el snapshot, para los refrescos periodicos
+    """
+    with _lock:
+        _tokens[(carrera, plan)] = token
+
+
+def refrescar_en_segundo_plano(token, carrera, plan):
+    """
+        Pide construir el snapshot sin esperarlo. Si ya hay uno pendiente para
+        la misma carrera y plan, no se pide otro
+    """
+    clave = (carrera, plan)
+    with _lock:
+        _tokens[clave] = token
+        if clave in _pendientes:
+            return
+        _pendientes.add(clave)
+
+    def refrescar():
+        try:
+            construir_snapshot(token, carrera, plan)
+        except Exception:
+            app.logger.exception('No se pudo construir el snapshot de %s plan %s', carrera, plan)
+        finally:
+            with _lock:
+                _pendientes.discard(clave)
+
+    get_executor().submit(refrescar)
+
+
+def get_token_refresco(clave):
+    """
+        Los refrescos periodicos usan el usuario de servicio si esta configurado,
+        y si no el ultimo token con el que se pidio el snapshot
+    """
+    if app.config['USERNAME']:
+        return DataProvider().retrieve_token(username=app.config['USERNAME'],
+                                             password=app.config['PASSWORD'])
+    return _tokens.get(clave)
+
+
+def refrescar_desactualizados():
+    """
+        Reconstruye los snapshots cuyas cursadas cambiaron de version en cache
+    """
+    provider = DataProvider()
+    for clave, snapshot in list(_snapshots.items()):
+        version = provider.get_version_cache_binaria(
+            provider.clave_cache('materiascursadas-df', snapshot.carrera))
+        if version is None or version != snapshot.version:
+            refrescar_en_segundo_plano(get_token_refresco(clave), *clave)
+
+
+def iniciar_refresco_periodico(intervalo=None):
+    """
+        Arranca un thread que cada intervalo segundos refresca los snapshots desactualizados
+    """
+    global _refresco
+    intervalo = intervalo or app.config['SNAPSHOT_INTERVALO']
+
+    def refrescar_periodicamente():
+        while True:
+            time.sleep(intervalo)
+            try:
+                refrescar_desactualizados()
+            except Exception:
+                app.logger.exception('Fallo el refresco periodico de los snapshots')
+
+    with _lock:
+        if _refresco is None:
+            _refresco = threading.Thread(target=refrescar_periodicamente,
+                                         name='refresco-snapshots', daemon=True)
+            _refresco.start()
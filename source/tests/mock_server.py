@@ -1,8 +1,19 @@
 from http_server_mock import HttpServerMock
+from flask import request
 import json
+import os
+import time
 
 mock_app = HttpServerMock(__name__)
 
+@mock_app.before_request
+def latencia():
+    """
+        Demora artificial de cada respuesta, en segundos
+        Se usa en los benchmarks para simular la latencia del backend
+    """
+    time.sleep(float(os.getenv('MOCK_LATENCIA', 0)))
+
 @mock_app.route("/api/token/", methods=["POST"])
 def token():
     """
@@ -95,8 +106,14 @@ def carrera_cantidad_cursantes_anio():
 
 @mock_app.route("/api/carreras/TEST/materiascursadas/", methods=["GET"])
 def carrera_materiascursadas():
+    """
+        Con el parametro desde (YYYY-MM-DD) devuelve solo las de esa fecha en adelante
+    """
     with open('source/tests/json/api_carreras_materiascursadas.json', 'r') as archivo:
         data = json.loads(archivo.read())
+    desde = request.args.get('desde')
+    if desde:
+        data = [materia for materia in data if materia['fecha'] and materia['fecha'] >= desde]
     return json.dumps(data)
 
 @mock_app.route("/api/carreras/TEST/cantidad-cursantes/<anio>/", methods=["GET"])
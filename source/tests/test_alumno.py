@@ -72,6 +72,25 @@ class AlumnoTest(unittest.TestCase):
         esperado = "5.67"
         self.assertEqual(resultado, esperado)
 
+    def test_aplicar_periodos_igual_a_por_fila(self):
+        """
+            El calculo vectorizado de periodos tiene que dar lo mismo que el calculo fila por fila
+        """
+        por_fila = self.dataframe.apply(self.manipulator.row_periodos, axis=1)
+        vectorizado = self.manipulator.aplicar_periodos(self.dataframe)
+        self.assertEqual(por_fila['fecha_periodo'].tolist(), vectorizado['fecha_periodo'].tolist())
+        self.assertEqual(por_fila['periodo_semestre'].tolist(), vectorizado['periodo_semestre'].tolist())
+
+    def test_aplicar_scores_igual_a_por_fila(self):
+        """
+            El score agrupado tiene que dar lo mismo que el calculo fila por fila
+        """
+        data = self.manipulator.recalcular_notas_faltantes(self.dataframe.copy())
+        data = self.manipulator.aplicar_periodos(data)
+        por_fila = data.apply(self.manipulator.row_score_periodo, args=(data, 2), axis=1)
+        agrupado = self.manipulator.aplicar_scores(data)
+        self.assertEqual(por_fila['score_periodo'].tolist(), agrupado['score_periodo'].tolist())
+
     def test_cantidad_aprobadas(self):
         materias_alumno = self.manipulator.filtrar_materias_de_alumno(
             self.dataframe, "1")
@@ -84,4 +103,31 @@ class AlumnoTest(unittest.TestCase):
         cantidad_aprobadas = self.manipulator.cantidad_aprobadas(materias_alumno) # Deberian ser 2
 
         porcentaje = self.manipulator.porcentaje_aprobadas(cantidad_aprobadas, self.cantidad_materias_necesarias) # (2/40)*100 = 5
-        self.assertEqual(porcentaje, 5)
\ No newline at end of file
+        self.assertEqual(porcentaje, 5)
+
+    def test_matriz_porcentajes_igual_a_por_alumno(self):
+        """
+            Cada fila de la matriz tiene que dar lo mismo que calcular area por area y nucleo por nucleo
+        """
+        areas = self.manipulator.matriz_porcentajes_aprobadas(self.df_plan, self.dataframe, 'area')
+        nucleos = self.manipulator.matriz_porcentajes_aprobadas(self.df_plan, self.dataframe, 'nucleo')
+        self.assertEqual(len(areas), self.dataframe.alumno.nunique())
+        for legajo in self.dataframe.alumno.unique():
+            materias_alumno = self.manipulator.filtrar_materias_de_alumno(self.dataframe, legajo)
+            for area in self.manipulator.areas_unicas(self.df_plan):
+                if area:
+                    esperado = self.manipulator.porcentaje_aprobadas_area(self.df_plan, materias_alumno, area)
+                    self.assertEqual(self.manipulator.porcentajes_alumno(areas, legajo)[area], esperado)
+            for nucleo in self.manipulator.nucleos_unicos(self.df_plan):
+                if nucleo:
+                    esperado = self.manipulator.porcentaje_aprobadas_nucleo(self.df_plan, materias_alumno, nucleo)
+                    self.assertEqual(self.manipulator.porcentajes_alumno(nucleos, legajo)[nucleo], esperado)
+
+    def test_matriz_porcentajes_alumno_sin_cursadas(self):
+        """
+            Un alumno pedido que no tiene cursadas queda con todo en 0
+        """
+        matriz = self.manipulator.matriz_porcentajes_aprobadas(self.df_plan, self.dataframe, 'nucleo', alumnos=['1', 'no-existe'])
+        self.assertEqual(matriz.index.tolist(), ['1', 'no-existe'])
+        self.assertTrue((matriz.loc['no-existe'].fillna(0) == 0).all())
+        self.assertEqual("%.2f" % matriz.loc['1', 'I'], '33.33')
@@ -1,10 +1,20 @@
 import unittest
 import json
 import requests
+from datetime import date, timedelta
+from unittest import mock
 from provider import DataProvider
+from transformer import DataTransformer
 from mock_server import mock_app
-from app import bp
-from flask import Flask
+from app import bp, get_materiascursadas, get_materiascursadas_plan
+from decorators import en_paralelo, memoizado_en_request
+import decorators
+import hashlib
+import jwt
+import time
+from config import app, cache
+import snapshots
+from flask import Flask, request
 
 test_app = Flask(__name__)
 test_app.register_blueprint(bp)
@@ -356,6 +366,19 @@ class AppTest(unittest.TestCase):
                 data = json.loads(response.data)
                 self.assertEqual(data['valor'], 1)
 
+    def test_porcentajes_nucleos_carrera(self):
+        """
+            El reporte de la carrera tiene una fila por alumno, igual a su endpoint por alumno
+        """
+        with self.mock_app.run(self.mock_url, self.mock_port):
+            with test_app.test_client() as client:
+                token = self.provider.retrieve_token()
+                headers = {"Authorization": f"Bearer {token}"}
+                response = client.get('/carreras/TEST/porcentajes-nucleos?plan=2019', headers=headers)
+                data = {fila['Alumno']: fila['Porcentajes'] for fila in json.loads(response.data)}
+                response = client.get('/alumnos/1/porcentajes-nucleos?carrera=TEST&plan=2019', headers=headers)
+                self.assertEqual(data['1'], json.loads(response.data))
+
     def test_notas_unauthorized(self):
         """
             Hago un request sin token, deberia darme 401
@@ -427,6 +450,223 @@ class AppTest(unittest.TestCase):
                 data = json.loads(response.data)
                 self.assertEqual(data['valor'], '5.0')
 
+    def test_alumnos_batch_unauthorized(self):
+        """
+            Hago un request sin token, deberia darme 401
+        """
+        with self.mock_app.run(self.mock_url, self.mock_port):
+            with test_app.test_client() as client:
+                response = client.get('/alumnos/batch?carrera=TEST&plan=2019&legajos=1,2')
+                self.assertEqual(response.status_code, 401)
+
+    def test_alumnos_batch_metrica_invalida(self):
+        """
+            Hago un request con una metrica que no existe, deberia darme 400
+        """
+        with self.mock_app.run(self.mock_url, self.mock_port):
+            with test_app.test_client() as client:
+                token = self.provider.retrieve_token()
+                response = client.get('/alumnos/batch?carrera=TEST&plan=2019&legajos=1&metricas=notas,otra', headers={"Authorization": f"Bearer {token}"})
+                self.assertEqual(response.status_code, 400)
+
+    def test_alumnos_batch(self):
+        """
+            Cada metrica de cada alumno deberia ser igual a la de su endpoint por alumno
+        """
+        metricas = ['scores', 'porcentajes-areas', 'porcentajes-nucleos', 'porcentaje-carrera']
+        with self.mock_app.run(self.mock_url, self.mock_port):
+            with test_app.test_client() as client:
+                token = self.provider.retrieve_token()
+                headers = {"Authorization": f"Bearer {token}"}
+                response = client.get('/alumnos/batch?carrera=TEST&plan=2019&legajos=1,9,2&metricas=' + ','.join(metricas), headers=headers)
+                data = json.loads(response.data)
+                self.assertEqual(list(data.keys()), ['1', '9', '2'])
+                for legajo in ['1', '9', '2']:
+                    for metrica in metricas:
+                        response = client.get(f'/alumnos/{legajo}/{metrica}?carrera=TEST&plan=2019', headers=headers)
+                        self.assertEqual(data[legajo][metrica], json.loads(response.data))
+
+    def test_endpoints_con_snapshot(self):
+        """
+            Leyendo del snapshot, los endpoints responden lo mismo que calculando todo en el request
+        """
+        urls = ['/alumnos/1/scores?carrera=TEST&plan=2019',
+                '/alumnos/1/porcentajes-areas?carrera=TEST&plan=2019',
+                '/alumnos/1/porcentaje-carrera?carrera=TEST&plan=2019&inicio=2018-01-01',
+                '/alumnos/batch?carrera=TEST&plan=2019&legajos=1,9&metricas=scores,porcentajes-nucleos',
+                '/carreras/TEST/materias-traba?plan=2019',
+                '/carreras/TEST/porcentajes-areas?plan=2019']
+        with self.mock_app.run(self.mock_url, self.mock_port):
+            with test_app.test_client() as client:
+                token = self.provider.retrieve_token()
+                headers = {"Authorization": f"Bearer {token}"}
+                esperado = [client.get(url, headers=headers).data for url in urls]
+                snapshots.construir_snapshot(token, 'TEST', '2019')
+                with mock.patch.dict(app.config, {'USAR_SNAPSHOTS': True}):
+                    for url, datos in zip(urls, esperado):
+                        self.assertEqual(client.get(url, headers=headers).data, datos)
+        snapshots._snapshots.clear()
+
+    def test_snapshot_revalida_y_recuerda_el_token(self):
+        """
+            Un request servido desde el snapshot recuerda su token para los refrescos,
+            revalida las cursadas vencidas y, si cambio su version, pide reconstruir el snapshot
+        """
+        url = '/carreras/TEST/materias-traba?plan=2019'
+        with self.mock_app.run(self.mock_url, self.mock_port):
+            with test_app.test_client() as client:
+                token = self.provider.retrieve_token()
+                headers = {"Authorization": f"Bearer {token}"}
+                snapshots.construir_snapshot(token, 'TEST', '2019')
+                snapshots._tokens.clear()
+                clave = self.provider.clave_cache('materiascursadas-df', 'TEST')
+                with mock.patch.dict(app.config, {'USAR_SNAPSHOTS': True}), \
+                        mock.patch('provider.revalidar') as revalidar, \
+                        mock.patch.object(snapshots, 'refrescar_en_segundo_plano') as refrescar:
+                    client.get(url, headers=headers)
+                    revalidar.assert_not_called()
+                    refrescar.assert_not_called()
+                    self.assertEqual(snapshots._tokens[('TEST', '2019')], token)
+
+                    cache.set(clave + ':fresco', b'0')
+                    client.get(url, headers=headers)
+                    self.assertEqual(revalidar.call_args[0][0], clave)
+                    refrescar.assert_not_called()
+
+                    self.provider.sincronizar_materiascursadas(token, 'TEST', completa=True)
+                    client.get(url, headers=headers)
+                    refrescar.assert_called_once_with(token, 'TEST', '2019')
+        snapshots._snapshots.clear()
+
+    def test_refrescar_snapshot(self):
+        with self.mock_app.run(self.mock_url, self.mock_port):
+            with test_app.test_client() as client:
+                token = self.provider.retrieve_token()
+                response = client.post('/carreras/TEST/snapshot?plan=2019', headers={"Authorization": f"Bearer {token}"})
+                self.assertEqual(response.status_code, 202)
+                snapshots.get_executor().submit(lambda: None).result()
+        self.assertIsNotNone(snapshots.get_snapshot('TEST', '2019'))
+        snapshots._snapshots.clear()
+
+    def test_sincronizar_materiascursadas(self):
+        with self.mock_app.run(self.mock_url, self.mock_port):
+            with test_app.test_client() as client:
+                token = self.provider.retrieve_token()
+                headers = {"Authorization": f"Bearer {token}"}
+                completa = json.loads(client.post('/carreras/TEST/materiascursadas/sincronizar?completa=true',
+                                                  headers=headers).data)
+                incremental = json.loads(client.post('/carreras/TEST/materiascursadas/sincronizar',
+                                                     headers=headers).data)
+        self.assertEqual(completa['cantidad'], 20)
+        self.assertEqual(incremental, completa)
+
+    def test_respuesta_cacheada(self):
+        """
+            La respuesta se reusa con el mismo ETag, y con If-None-Match responde 304.
+            Cuando cambian las cursadas en cache, cambia el ETag
+        """
+        url = '/materias/90028/dispersion-notas?carrera=TEST'
+        with self.mock_app.run(self.mock_url, self.mock_port):
+            with test_app.test_client() as client:
+                token = self.provider.retrieve_token()
+                headers = {"Authorization": f"Bearer {token}"}
+                original = client.get(url, headers=headers)
+                with mock.patch.dict(app.config, {'USAR_CACHE_RESPUESTAS': True}):
+                    primera = client.get(url, headers=headers)
+                    with mock.patch('app.DataTransformer.merge_materias_con_promedio') as merge:
+                        segunda = client.get(url, headers=headers)
+                        condicional = client.get(url, headers=dict(headers, **{'If-None-Match': primera.headers['ETag']}))
+                        merge.assert_not_called()
+                    client.post('/carreras/TEST/materiascursadas/sincronizar?completa=true', headers=headers)
+                    tercera = client.get(url, headers=dict(headers, **{'If-None-Match': primera.headers['ETag']}))
+        self.assertEqual(primera.data, original.data)
+        self.assertEqual(segunda.data, original.data)
+        self.assertEqual(segunda.headers['ETag'], primera.headers['ETag'])
+        self.assertEqual(condicional.status_code, 304)
+        self.assertEqual(condicional.data, b'')
+        self.assertEqual(tercera.status_code, 200)
+        self.assertNotEqual(tercera.headers['ETag'], primera.headers['ETag'])
+        self.assertEqual(tercera.data, original.data)
+
+    def test_respuesta_cacheada_etag_por_representacion(self):
+        """
+            Otro formato, u otro dia, de los mismos datos no comparte el ETag
+        """
+        url = '/materias/90028/dispersion-notas?carrera=TEST'
+        with self.mock_app.run(self.mock_url, self.mock_port):
+            with test_app.test_client() as client:
+                token = self.provider.retrieve_token()
+                headers = {"Authorization": f"Bearer {token}"}
+                with mock.patch.dict(app.config, {'USAR_CACHE_RESPUESTAS': True}):
+                    binario = client.get(url, headers=dict(headers, Accept='application/vnd.sadi.columnas'))
+                    registros = client.get(url, headers=dict(headers, **{'If-None-Match': binario.headers['ETag']}))
+                    with mock.patch('decorators.date') as fecha:
+                        fecha.today.return_value = date.today() + timedelta(days=1)
+                        manana = client.get(url, headers=dict(headers, **{'If-None-Match': registros.headers['ETag']}))
+        self.assertEqual(registros.status_code, 200)
+        self.assertNotEqual(registros.data, binario.data)
+        self.assertNotEqual(registros.headers['ETag'], binario.headers['ETag'])
+        self.assertEqual(manana.status_code, 200)
+        self.assertNotEqual(manana.headers['ETag'], registros.headers['ETag'])
+
+    def test_respuesta_cacheada_por_argumentos(self):
+        """
+            Cada combinacion de argumentos tiene su propia respuesta guardada
+        """
+        with self.mock_app.run(self.mock_url, self.mock_port):
+            with test_app.test_client() as client:
+                token = self.provider.retrieve_token()
+                headers = {"Authorization": f"Bearer {token}"}
+                with mock.patch.dict(app.config, {'USAR_CACHE_RESPUESTAS': True}):
+                    todas = client.get('/materias/90028/basicos?carrera=TEST', headers=headers)
+                    periodo = client.get('/materias/90028/basicos?carrera=TEST&inicio=2019-01-01&fin=2019-12-31',
+                                         headers=headers)
+                    todas_de_nuevo = client.get('/materias/90028/basicos?carrera=TEST', headers=headers)
+        self.assertNotEqual(todas.data, periodo.data)
+        self.assertEqual(todas_de_nuevo.data, todas.data)
+
+    def test_dispersion_por_columnas(self):
+        """
+            Con formato=columnas (o el header Accept) viene un array por columna,
+            con los mismos datos que los registros
+        """
+        url = '/carreras/TEST/dispersion-score-promedio?dias=18250'
+        with self.mock_app.run(self.mock_url, self.mock_port):
+            with test_app.test_client() as client:
+                token = self.provider.retrieve_token()
+                headers = {"Authorization": f"Bearer {token}"}
+                registros = json.loads(client.get(url, headers=headers).data)
+                response = client.get(url + '&formato=columnas', headers=headers)
+                por_accept = client.get(url, headers=dict(headers, Accept='application/vnd.sadi.columnas+json'))
+        self.assertEqual(response.mimetype, 'application/vnd.sadi.columnas+json')
+        self.assertEqual(por_accept.data, response.data)
+        columnas = json.loads(response.data)
+        self.assertEqual(list(columnas), ['Promedio', 'Alumno', 'Score'])
+        self.assertEqual([dict(zip(columnas, valores)) for valores in zip(*columnas.values())], registros)
+
+    def test_dispersion_binario(self):
+        url = '/materias/90028/dispersion-notas?carrera=TEST'
+        with self.mock_app.run(self.mock_url, self.mock_port):
+            with test_app.test_client() as client:
+                token = self.provider.retrieve_token()
+                headers = {"Authorization": f"Bearer {token}"}
+                registros = json.loads(client.get(url, headers=headers).data)
+                response = client.get(url, headers=dict(headers, Accept='application/vnd.sadi.columnas'))
+                desconocido = client.get(url + '&formato=xml', headers=headers)
+        self.assertEqual(response.mimetype, 'application/vnd.sadi.columnas')
+        df = DataTransformer().transform_bytes_to_dataframe(response.data)
+        self.assertEqual(df.to_dict('records'), registros)
+        self.assertEqual(desconocido.status_code, 400)
+
+    def test_estadisticas_cache(self):
+        with self.mock_app.run(self.mock_url, self.mock_port):
+            with test_app.test_client() as client:
+                token = self.provider.retrieve_token()
+                headers = {"Authorization": f"Bearer {token}"}
+                client.get('/alumnos/1/porcentajes-areas?carrera=TEST&plan=2019', headers=headers)
+                data = json.loads(client.get('/estadisticas/cache', headers=headers).data)
+                self.assertGreater(data['hits'] + data['misses'], 0)
+
     def test_dispersion_score_unauthorized(self):
         """
             Hago un request sin token, deberia darme 401
@@ -450,4 +690,90 @@ class AppTest(unittest.TestCase):
                 data = json.loads(response.data)
                 for alumno in data:
                     if alumno['Alumno'] == '9':
-                        self.assertEqual(alumno['Score'], 2)
\ No newline at end of file
+                        self.assertEqual(alumno['Score'], 2)
+
+    def test_memoizacion_en_request(self):
+        """
+            Dentro de un mismo request, las cursadas se piden y transforman una sola vez
+        """
+        with self.mock_app.run(self.mock_url, self.mock_port):
+            token = self.provider.retrieve_token()
+            with mock.patch.object(DataProvider, 'get_materiascursadas_indexer', autospec=True,
+                                   side_effect=DataProvider.get_materiascursadas_indexer) as get_cursadas:
+                with test_app.test_request_context('/?carrera=TEST&plan=2019', headers={"Authorization": f"Bearer {token}"}):
+                    get_materiascursadas_plan(request)
+                    primera = get_materiascursadas(request)
+                    segunda = get_materiascursadas(request)
+                self.assertEqual(get_cursadas.call_count, 1)
+                self.assertIs(primera, segunda)
+
+    def test_server_timing(self):
+        """
+            Con las metricas activadas, la respuesta dice cuanto tardo cada etapa,
+            y /estadisticas/etapas acumula los bytes traidos del backend
+        """
+        with self.mock_app.run(self.mock_url, self.mock_port):
+            with test_app.test_client() as client:
+                token = self.provider.retrieve_token()
+                headers = {"Authorization": f"Bearer {token}"}
+                with mock.patch.dict(app.config, {'METRICAS': True, 'SERVER_TIMING': True, 'USAR_CACHE': False}):
+                    response = client.get('/alumnos/1/scores?carrera=TEST&plan=2019', headers=headers)
+                    etapas = json.loads(client.get('/estadisticas/etapas', headers=headers).data)
+                sin_metricas = client.get('/alumnos/1/scores?carrera=TEST&plan=2019', headers=headers)
+        self.assertIn('manipulator.get_scores_periodos;dur=', response.headers['Server-Timing'])
+        self.assertIn('total;dur=', response.headers['Server-Timing'])
+        self.assertGreater(etapas['provider.retrieve_materiascursadas_registros']['bytes'], 0)
+        self.assertGreater(etapas['transformer.merge_materias_con_plan']['filas_salida'], 0)
+        self.assertNotIn('Server-Timing', sin_metricas.headers)
+
+    def test_token_verificado_una_vez(self):
+        """
+            Los requests con el mismo token no lo vuelven a verificar hasta que vence,
+            y los permisos se siguen chequeando en cada request
+        """
+        exp = int(time.time()) + 3600
+        token = jwt.encode({'carreras': ['TEST'], 'exp': exp}, app.config['SECRET_KEY'],
+                           algorithm='HS256').decode('utf8')
+        headers = {"Authorization": f"Bearer {token}"}
+        with self.mock_app.run(self.mock_url, self.mock_port):
+            with test_app.test_client() as client:
+                with mock.patch('decorators.jwt.decode', wraps=jwt.decode) as decode:
+                    primera = client.get('/carreras/TEST/cursantes-actual?carreras=TEST', headers=headers)
+                    segunda = client.get('/carreras/TEST/cursantes-actual?carreras=TEST', headers=headers)
+                    sin_permiso = client.get('/carreras/TEST/cursantes-actual?carreras=OTRA', headers=headers)
+                    self.assertEqual(decode.call_count, 1)
+                    with mock.patch('decorators.time.time', return_value=exp):
+                        client.get('/carreras/TEST/cursantes-actual?carreras=TEST', headers=headers)
+                    self.assertEqual(decode.call_count, 2)
+        self.assertEqual(primera.status_code, 200)
+        self.assertEqual(segunda.status_code, 200)
+        self.assertEqual(sin_permiso.status_code, 401)
+
+    def test_token_invalido_no_se_guarda(self):
+        token = jwt.encode({'carreras': ['TEST']}, 'otra-clave', algorithm='HS256').decode('utf8')
+        with test_app.test_client() as client:
+            for _ in range(2):
+                response = client.get('/carreras/TEST/cursantes-actual', headers={"Authorization": f"Bearer {token}"})
+                self.assertEqual(response.status_code, 401)
+        self.assertNotIn(hashlib.sha256(token.encode('utf8')).digest(), decorators._tokens)
+
+    def test_en_paralelo_mantiene_orden(self):
+        with test_app.test_request_context('/'):
+            resultado = en_paralelo(lambda: 1, lambda: 2, lambda: 3)
+        self.assertEqual(resultado, [1, 2, 3])
+
+    def test_en_paralelo_comparte_memoizacion(self):
+        """
+            Lo memoizado dentro de una funcion en paralelo queda disponible para el request
+        """
+        llamadas = []
+
+        @memoizado_en_request('test')
+        def recurso(clave):
+            llamadas.append(clave)
+            return request.args.get('carrera')
+
+        with test_app.test_request_context('/?carrera=TEST'):
+            en_paralelo(lambda: recurso('a'), lambda: recurso('b'))
+            self.assertEqual(recurso('a'), 'TEST')
+        self.assertEqual(sorted(llamadas), ['a', 'b'])
@@ -0,0 +1,120 @@
+import unittest
+from unittest import mock
+from caches import CacheLocal, CacheMemcached, CacheEnNiveles, crear_cache
+
+
+class CachesTest(unittest.TestCase):
+
+    def test_lru_por_bytes(self):
+        """
+            Al pasarse del limite de bytes se descarta el usado hace mas tiempo
+        """
+        cache = CacheLocal(max_bytes=10)
+        cache.set('a', b'1234')
+        cache.set('b', b'1234')
+        cache.get('a')
+        cache.set('c', b'1234')
+        self.assertEqual(cache.get_many(['a', 'b', 'c']), {'a': b'1234', 'c': b'1234'})
+        self.assertEqual(cache.bytes, 8)
+
+    def test_valor_mas_grande_que_la_cache(self):
+        cache = CacheLocal(max_bytes=10)
+        self.assertFalse(cache.set('a', b'x' * 11))
+        self.assertIsNone(cache.get('a'))
+
+    def test_reemplazar_valor(self):
+        cache = CacheLocal(max_bytes=10)
+        cache.set('a', b'1234')
+        cache.set('a', b'12')
+        self.assertEqual(cache.get('a'), b'12')
+        self.assertEqual(cache.bytes, 2)
+
+    def test_ttl(self):
+        cache = CacheLocal(max_bytes=100)
+        with mock.patch('caches.time.time', return_value=1000):
+            cache.set('a', b'1', expire=10)
+            cache.set('b', b'1')
+        with mock.patch('caches.time.time', return_value=1011):
+            self.assertIsNone(cache.get('a'))
+            self.assertEqual(cache.get('b'), b'1')
+        self.assertEqual(cache.bytes, 1)
+
+    def test_max_ttl(self):
+        """
+            Con max_ttl, ni los valores que no expiran duran mas que eso
+        """
+        cache = CacheLocal(max_bytes=100, max_ttl=5)
+        with mock.patch('caches.time.time', return_value=1000):
+            cache.set('a', b'1')
+        with mock.patch('caches.time.time', return_value=1006):
+            self.assertIsNone(cache.get('a'))
+
+    def test_add(self):
+        """
+            add solo guarda si la clave no esta o ya expiro
+        """
+        cache = CacheLocal(max_bytes=100)
+        with mock.patch('caches.time.time', return_value=1000):
+            self.assertTrue(cache.add('a', b'1', expire=10))
+            self.assertFalse(cache.add('a', b'2', expire=10))
+        with mock.patch('caches.time.time', return_value=1011):
+            self.assertTrue(cache.add('a', b'3', expire=10))
+            self.assertEqual(cache.get('a'), b'3')
+
+    def test_contadores(self):
+        cache = CacheLocal(max_bytes=100)
+        cache.set('a', b'1')
+        cache.get('a')
+        cache.get_many(['a', 'b'])
+        self.assertEqual(cache.estadisticas(), {'hits': 2, 'misses': 1, 'items': 1, 'bytes': 1})
+
+    def test_en_niveles(self):
+        """
+            Lo que se encuentra en la remota queda tambien en la local
+        """
+        remota = CacheLocal(max_bytes=100)
+        remota.set('a', b'1')
+        remota.set('b', b'2')
+        cache = CacheEnNiveles(CacheLocal(max_bytes=100), remota)
+        self.assertEqual(cache.get('a'), b'1')
+        self.assertEqual(cache.get_many(['a', 'b', 'c']), {'a': b'1', 'b': b'2'})
+        self.assertEqual(cache.local.get_many(['a', 'b']), {'a': b'1', 'b': b'2'})
+        cache.set('c', b'3')
+        self.assertEqual(remota.get('c'), b'3')
+
+
+    def test_contadores_en_niveles(self):
+        """
+            Es hit si se encuentra en cualquiera de los niveles, y miss si no esta en ninguno
+        """
+        remota = CacheLocal(max_bytes=100)
+        remota.set('a', b'1')
+        cache = CacheEnNiveles(CacheLocal(max_bytes=100), remota)
+        cache.get('a')
+        cache.get('a')
+        cache.get('b')
+        estadisticas = cache.estadisticas()
+        self.assertEqual((estadisticas['hits'], estadisticas['misses']), (2, 1))
+        self.assertEqual(estadisticas['local']['misses'], 2)
+
+    def test_memcached_caido(self):
+        """
+            Si memcached no responde, leer es un miss y escribir no falla
+        """
+        cache = CacheMemcached('localhost:1')
+        cache.set('a', b'1')
+        self.assertIsNone(cache.get('a'))
+        self.assertEqual(cache.get_many(['a']), {})
+        self.assertEqual(cache.estadisticas(), {'hits': 0, 'misses': 2})
+
+    def test_crear_cache(self):
+        config = {'CACHE_BACKEND': 'local', 'CACHE_LOCAL_BYTES': 100, 'CACHE_LOCAL_TTL': 5,
+                  'MEMCACHED_SERVIDOR': 'localhost:1', 'MEMCACHED_POOL_SIZE': 1}
+        self.assertIsInstance(crear_cache(config), CacheLocal)
+        config['CACHE_BACKEND'] = 'local+memcached'
+        cache = crear_cache(config)
+        self.assertIsInstance(cache, CacheEnNiveles)
+        self.assertEqual(cache.local.max_ttl, 5)
+        config['CACHE_BACKEND'] = 'otro'
+        with self.assertRaises(ValueError):
+            crear_cache(config)
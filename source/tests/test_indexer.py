@@ -0,0 +1,49 @@
+from indexer import DataIndexer
+from transformer import DataTransformer
+import pandas as pd
+import unittest
+import json
+
+
+class IndexerTest(unittest.TestCase):
+
+    def setUp(self):
+        transformer = DataTransformer()
+        with open('source/tests/json/api_carreras_materiascursadas.json', 'r') as archivo_alumnos:
+            data = json.loads(archivo_alumnos.read())
+            self.df_cursadas = transformer.transform_materiascursadas_to_dataframe(data)
+        self.indexer = DataIndexer(self.df_cursadas)
+
+    def test_filtrar_alumno_igual_a_mascara(self):
+        """
+            Para cada alumno, el indice trae las mismas filas, en el mismo orden, que filtrar con una mascara
+        """
+        for legajo in self.df_cursadas.alumno.unique():
+            esperado = self.df_cursadas.loc[self.df_cursadas.alumno == legajo]
+            pd.testing.assert_frame_equal(self.indexer.filtrar_alumno(legajo), esperado)
+
+    def test_filtrar_materia_igual_a_mascara(self):
+        for codigo in self.df_cursadas.codigo.unique():
+            esperado = self.df_cursadas.loc[self.df_cursadas.codigo == codigo]
+            pd.testing.assert_frame_equal(self.indexer.filtrar_materia(codigo), esperado)
+
+    def test_filtrar_valor_inexistente(self):
+        self.assertTrue(self.indexer.filtrar_alumno('no-existe').empty)
+
+    def test_columnas_de_texto(self):
+        """
+            Tambien indexa columnas que no son categoricas, con nulos
+        """
+        df = pd.DataFrame({'alumno': ['1', None, '2', '1'], 'codigo': ['a', 'b', 'a', 'b']})
+        indexer = DataIndexer(df)
+        self.assertEqual(indexer.filtrar_alumno('1').index.tolist(), [0, 3])
+        self.assertEqual(indexer.filtrar_materia('b').index.tolist(), [1, 3])
+
+    def test_filtrar_alumnos(self):
+        """
+            Trae las filas de cada legajo, agrupadas en el orden pedido
+        """
+        legajos = ['2', 'no-existe', '1']
+        esperado = pd.concat([self.indexer.filtrar_alumno(legajo) for legajo in legajos])
+        pd.testing.assert_frame_equal(self.indexer.filtrar_alumnos(legajos), esperado)
+        self.assertTrue(self.indexer.filtrar_alumnos([]).empty)
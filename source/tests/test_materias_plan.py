@@ -127,6 +127,43 @@ class MateriasPlanTest(unittest.TestCase):
             self.dataframe, None, None)
         self.assertEqual(len(alumnos), 20)
 
+    def test_materias_traba_igual_a_por_fila(self):
+        """
+            El indice de aprobacion pivoteado tiene que dar lo mismo que el calculo fila por fila
+        """
+        contadas = self.manipulator.contar_aprobados_desaprobados(
+            self.manipulator.transformar_aprobados_desaprobados(self.dataframe.copy()))
+        esperado = contadas.apply(self.manipulator.row_totales_aprobados_desaprobados,
+                                  args=(contadas, 2), axis=1)
+        esperado = esperado.drop_duplicates(subset=['codigo'], keep='first')
+        resultado = self.manipulator.calcular_materias_traba(self.dataframe.copy())
+        self.assertEqual(esperado['codigo'].tolist(), resultado['codigo'].tolist())
+        self.assertEqual(esperado['indice_aprobacion'].tolist(), resultado['indice_aprobacion'].tolist())
+
+    def test_materias_traba_score(self):
+        """
+            El score de cada materia es el calculado por calcular_score_materia
+        """
+        from utils import calcular_score_materia
+        resultado = self.manipulator.calcular_materias_traba(self.dataframe.copy())
+        for index, row in resultado.iterrows():
+            self.assertAlmostEqual(row['score'], calcular_score_materia(
+                row['cantidad_obligatoria_de'], row['indice_aprobacion']))
+
+
+    def test_materias_traba_sin_aprobados_ni_desaprobados(self):
+        """
+            Si una materia solo tiene resultados pendientes (E), su indice de aprobacion es 0
+        """
+        df = self.dataframe.copy()
+        df['resultado'] = 'E'
+        resultado = self.manipulator.calcular_materias_traba(df)
+        self.assertFalse(resultado.empty)
+        self.assertTrue((resultado['indice_aprobacion'] == 0).all())
+
+    def test_materias_traba_vacio(self):
+        resultado = self.manipulator.calcular_materias_traba(self.dataframe.iloc[0:0])
+        self.assertTrue(resultado.empty)
 
 if __name__ == '__main__':
     unittest.main()
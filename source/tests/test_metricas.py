@@ -0,0 +1,51 @@
+import unittest
+from unittest import mock
+import pandas as pd
+import metricas
+from config import app
+
+
+@metricas.medido
+def duplicar(df):
+    return pd.concat([df, df])
+
+
+class MetricasTest(unittest.TestCase):
+
+    def setUp(self):
+        metricas._totales.clear()
+        self.df = pd.DataFrame({'a': [1, 2, 3]})
+
+    def test_desactivadas(self):
+        with mock.patch.dict(app.config, {'METRICAS': False}):
+            self.assertEqual(len(duplicar(self.df)), 6)
+        self.assertEqual(metricas.estadisticas(), {})
+
+    def test_medido(self):
+        """
+            Se registran las veces, y las filas que entran y salen de la etapa
+        """
+        with mock.patch.dict(app.config, {'METRICAS': True}):
+            duplicar(self.df)
+            duplicar(self.df)
+        etapa = metricas.estadisticas()['test_metricas.duplicar']
+        self.assertEqual(etapa['veces'], 2)
+        self.assertEqual(etapa['filas_entrada'], 6)
+        self.assertEqual(etapa['filas_salida'], 12)
+        self.assertGreater(etapa['segundos'], 0)
+
+    def test_contar_filas_de_tupla(self):
+        self.assertEqual(metricas.contar_filas(('version', self.df)), 3)
+        self.assertIsNone(metricas.contar_filas('texto'))
+
+    def test_contar_bytes(self):
+        chunks = list(metricas.contar_bytes('lectura', iter([b'abc', b'de'])))
+        self.assertEqual(chunks, [b'abc', b'de'])
+        self.assertEqual(metricas.estadisticas()['lectura']['bytes'], 5)
+
+    def test_server_timing(self):
+        """
+            Las etapas repetidas se suman, y el total va al final
+        """
+        header = metricas.server_timing([('a', 0.001), ('b', 0.002), ('a', 0.003)], 0.01)
+        self.assertEqual(header, 'a;dur=4.00, b;dur=2.00, total;dur=10.00')
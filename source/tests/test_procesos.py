@@ -0,0 +1,73 @@
+import unittest
+from unittest import mock
+import json
+import pandas as pd
+from werkzeug.exceptions import HTTPException
+from config import app
+from transformer import DataTransformer
+from manipulator import DataManipulator
+import procesos
+
+
+class ProcesosTest(unittest.TestCase):
+
+    def setUp(self):
+        transformer = DataTransformer()
+        with open('source/tests/json/api_carreras_materiascursadas.json', 'r') as archivo_alumnos:
+            cursadas = transformer.transform_materiascursadas_to_dataframe(json.loads(archivo_alumnos.read()))
+        with open('source/tests/json/api_carreras_planes_anio.json', 'r') as archivo_plan:
+            plan = transformer.transform_to_dataframe(json.loads(archivo_plan.read()))
+        self.dataframe = transformer.merge_materias_con_plan(cursadas, plan)
+        self.config = mock.patch.dict(app.config, {'PROCESOS_WORKERS': 1, 'PROCESOS_COLA': 0,
+                                                   'PROCESOS_MIN_FILAS': 0, 'PROCESOS_TIMEOUT': 60})
+        self.config.start()
+
+    def tearDown(self):
+        self.config.stop()
+        if procesos._pool is not None:
+            procesos._pool.shutdown()
+            procesos._pool = None
+
+    def test_calcular_en_pool_igual_a_en_thread(self):
+        """
+            Calculado en el pool da lo mismo que calculado en el thread, salvo el indice
+        """
+        manipulator = DataManipulator()
+        for metodo, columnas in procesos.METODOS.items():
+            esperado = getattr(manipulator, metodo)(self.dataframe).reset_index(drop=True)
+            resultado = procesos.calcular(metodo, self.dataframe, conservar=('plan',))
+            pd.testing.assert_frame_equal(resultado, esperado[resultado.columns])
+            self.assertNotIn('obligatorias', resultado.columns)
+
+    def test_calcular_sin_pool(self):
+        """
+            Con el pool deshabilitado se calcula en el thread, sin crear procesos
+        """
+        with mock.patch.dict(app.config, {'PROCESOS_WORKERS': 0}):
+            procesos.calcular('get_scores_periodos', self.dataframe)
+        self.assertIsNone(procesos._pool)
+
+    def test_metodo_no_permitido(self):
+        with self.assertRaises(ValueError):
+            procesos.calcular('filtrar_aprobados', self.dataframe)
+
+    def test_cola_llena(self):
+        """
+            Si no hay cupos en el pool, responde 503 sin encolar el calculo
+        """
+        _, cupos = procesos.get_pool()
+        cupos.acquire()
+        try:
+            with app.test_request_context():
+                with self.assertRaises(HTTPException) as error:
+                    procesos.calcular('get_scores_periodos', self.dataframe)
+            self.assertEqual(error.exception.code, 503)
+        finally:
+            cupos.release()
+
+    def test_timeout(self):
+        with mock.patch.dict(app.config, {'PROCESOS_TIMEOUT': 0.000001}):
+            with app.test_request_context():
+                with self.assertRaises(HTTPException) as error:
+                    procesos.calcular('calcular_materias_traba', self.dataframe)
+        self.assertEqual(error.exception.code, 504)
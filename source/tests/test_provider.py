@@ -1,8 +1,14 @@
 import unittest
 import json
 import requests
+from unittest import mock
 from mock_server import mock_app
-from provider import DataProvider
+from provider import DataProvider, get_session, una_sola_vez
+from config import app, cache
+from transformer import DataTransformer
+import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
+import time
 
 class ProviderTest(unittest.TestCase):
 
@@ -82,4 +88,262 @@ class ProviderTest(unittest.TestCase):
         with self.mock_app.run(self.url, self.port):
             token = self.provider.retrieve_token()
             postulantes = self.provider.get_postulantes(token, 'TEST', 2019)
-            self.assertEqual(postulantes['cantidad'], 3)
\ No newline at end of file
+            self.assertEqual(postulantes['cantidad'], 3)
+
+    def test_clave_cache(self):
+        clave = self.provider.clave_cache('graduados', 'TEST', 2019)
+        self.assertEqual(clave, 'graduados:TEST:2019')
+
+    def test_clave_cache_sin_anio(self):
+        """
+            Los pedidos con y sin año no pueden compartir la clave
+        """
+        clave = self.provider.clave_cache('graduados', 'TEST', None)
+        self.assertNotEqual(clave, self.provider.clave_cache('graduados', 'TEST', 2019))
+
+    def test_get_plan_cacheado(self):
+        """
+            Una vez traido el plan, se sirve desde la cache aunque el backend no este levantado
+        """
+        with self.mock_app.run(self.url, self.port):
+            token = self.provider.retrieve_token()
+            materias = self.provider.get_plan(token, 'TEST', 2019)
+        self.assertEqual(self.provider.get_plan(token, 'TEST', 2019), materias)
+
+    def test_get_plan_sin_cache(self):
+        """
+            Si no se usa la cache, se va siempre al backend
+        """
+        with self.mock_app.run(self.url, self.port):
+            token = self.provider.retrieve_token()
+            self.provider.get_plan(token, 'TEST', 2019)
+        with self.assertRaises(requests.exceptions.ConnectionError):
+            DataProvider(usar_cache=False).get_plan(token, 'TEST', 2019)
+
+    def test_get_materiascursadas_dataframe(self):
+        with self.mock_app.run(self.url, self.port):
+            token = self.provider.retrieve_token()
+            df = DataProvider(usar_cache=False).get_materiascursadas_dataframe(token, 'TEST')
+            self.assertEqual(len(df), 20)
+            self.assertIn('codigo', df.columns)
+
+    def test_cache_binaria_en_partes(self):
+        """
+            Un valor mas grande que el tamaño de parte se guarda en varias claves y se lee entero
+        """
+        tamanio = app.config['CACHE_TAMANIO_PARTE']
+        app.config['CACHE_TAMANIO_PARTE'] = 10
+        try:
+            data = bytes(range(256)) * 3
+            version = self.provider.set_cache_binaria('test-binario', data, 'default')
+            self.assertEqual(self.provider.get_cache_binaria('test-binario'), (version, data))
+        finally:
+            app.config['CACHE_TAMANIO_PARTE'] = tamanio
+
+    def test_session_compartida(self):
+        """
+            Todos los DataProvider usan la misma sesion, con su pool de conexiones
+        """
+        self.assertIs(get_session(), get_session())
+        adapter = get_session().get_adapter('http://backend:8001')
+        self.assertEqual(adapter._pool_maxsize, app.config['HTTP_POOL_SIZE'])
+        self.assertEqual(adapter.max_retries.total, app.config['HTTP_REINTENTOS'])
+
+    def test_get_materiascursadas_indexer_reutilizado(self):
+        """
+            Mientras el dataset en cache no cambie, se reutiliza el mismo indice
+        """
+        with self.mock_app.run(self.url, self.port):
+            token = self.provider.retrieve_token()
+            indexer = self.provider.get_materiascursadas_indexer(token, 'TEST')
+            self.assertIs(self.provider.get_materiascursadas_indexer(token, 'TEST'), indexer)
+            self.assertEqual(len(indexer.filtrar_alumno('1')), len(indexer.df.loc[indexer.df.alumno == '1']))
+
+    def test_una_sola_vez(self):
+        """
+            Los threads que piden la misma clave a la vez esperan un solo pedido
+        """
+        llamadas = []
+
+        def traer():
+            llamadas.append(1)
+            time.sleep(0.2)
+            return ['resultado']
+
+        with ThreadPoolExecutor(max_workers=5) as executor:
+            resultados = list(executor.map(lambda _: una_sola_vez('test-vuelo', traer), range(5)))
+        self.assertEqual(len(llamadas), 1)
+        self.assertTrue(all(resultado is resultados[0] for resultado in resultados))
+
+    def test_una_sola_vez_con_error(self):
+        """
+            Si el pedido falla, todos reciben el error, y el siguiente pedido se vuelve a hacer
+        """
+        def fallar():
+            raise ValueError
+
+        with self.assertRaises(ValueError):
+            una_sola_vez('test-vuelo-error', fallar)
+        self.assertEqual(una_sola_vez('test-vuelo-error', lambda: 1), 1)
+
+    def test_get_cacheado_vencido(self):
+        """
+            Un valor vencido se sirve igual, y se revalida en segundo plano una sola vez
+        """
+        llamadas = []
+
+        def retrieve(token, arg):
+            llamadas.append(arg)
+            return [len(llamadas)]
+
+        self.assertEqual(self.provider.get_cacheado('test-vencido', retrieve, 'token', 'x'), [1])
+        # Lo vence
+        cache.set('test-vencido:x:fresco', b'0')
+        self.assertEqual(self.provider.get_cacheado('test-vencido', retrieve, 'token', 'x'), [1])
+        for _ in range(50):
+            if cache.get('test-vencido:x:revalidando') is None:
+                break
+            time.sleep(0.02)
+        self.assertEqual(len(llamadas), 2)
+        self.assertEqual(self.provider.get_cacheado('test-vencido', retrieve, 'token', 'x'), [2])
+        self.assertFalse(self.provider.esta_vencido('test-vencido:x'))
+
+    def test_revalidacion_con_lock_tomado(self):
+        """
+            Si otro ya esta revalidando la clave, no se revalida de nuevo
+        """
+        llamadas = []
+
+        def retrieve(token, arg):
+            llamadas.append(arg)
+            return [len(llamadas)]
+
+        self.provider.get_cacheado('test-lock', retrieve, 'token', 'x')
+        cache.set('test-lock:x:fresco', b'0')
+        cache.set('test-lock:x:revalidando', b'1')
+        self.assertEqual(self.provider.get_cacheado('test-lock', retrieve, 'token', 'x'), [1])
+        time.sleep(0.1)
+        self.assertEqual(len(llamadas), 1)
+        cache.delete('test-lock:x:revalidando')
+
+    def test_get_cacheado_hit_en_un_pedido(self):
+        """
+            Un hit trae el valor, su version y su marca de fresco en un solo pedido a la cache
+        """
+        self.provider.get_cacheado('test-hit', lambda token, arg: [1], 'token', 'x')
+        with mock.patch.object(self.provider, 'esta_vencido') as esta_vencido, \
+                mock.patch.object(cache, 'get_many', wraps=cache.get_many) as get_many:
+            self.assertEqual(self.provider.get_cacheado('test-hit', lambda token, arg: [2], 'token', 'x'), [1])
+        esta_vencido.assert_not_called()
+        get_many.assert_called_once_with(['test-hit:x', 'test-hit:x:version', 'test-hit:x:fresco'])
+
+    def test_get_cacheado_espera_a_otro_proceso(self):
+        """
+            Si otro proceso tiene el lock de la clave, se espera a que la deje en cache
+            en lugar de ir al backend
+        """
+        llamadas = []
+
+        def retrieve(token, arg):
+            llamadas.append(arg)
+            return [len(llamadas)]
+
+        cache.add('test-otro:x:trayendo', b'1')
+
+        def otro_proceso():
+            time.sleep(0.3)
+            self.provider.set_cache('test-otro:x', b'["del otro"]', 'test-otro')
+            cache.delete('test-otro:x:trayendo')
+
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            executor.submit(otro_proceso)
+            self.assertEqual(self.provider.get_cacheado('test-otro', retrieve, 'token', 'x'), ['del otro'])
+        self.assertEqual(llamadas, [])
+
+    def test_get_cacheado_lock_liberado_sin_valor(self):
+        """
+            Si el otro proceso libera el lock sin dejar el valor (porque fallo), se trae del backend
+        """
+        cache.add('test-fallo:x:trayendo', b'1')
+
+        def otro_proceso():
+            time.sleep(0.2)
+            cache.delete('test-fallo:x:trayendo')
+
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            executor.submit(otro_proceso)
+            self.assertEqual(self.provider.get_cacheado('test-fallo', lambda token, arg: [1], 'token', 'x'), [1])
+        self.assertIsNone(cache.get('test-fallo:x:trayendo'))
+
+    def retrieve_contando(self, pedidos):
+        """
+            Envuelve retrieve_materiascursadas_registros guardando el desde y la cantidad de registros de cada pedido
+        """
+        retrieve = self.provider.retrieve_materiascursadas_registros
+
+        def contar(token, carrera, desde=None):
+            registros = list(retrieve(token, carrera, desde=desde))
+            pedidos.append((desde, len(registros)))
+            return iter(registros)
+        self.provider.retrieve_materiascursadas_registros = contar
+
+    def test_sincronizar_materiascursadas_incremental(self):
+        """
+            Solo se piden al backend las cursadas desde la ultima fecha en cache,
+            y el dataset queda igual al de una sincronizacion completa
+        """
+        with self.mock_app.run(self.url, self.port):
+            token = self.provider.retrieve_token()
+            completo = self.provider.sincronizar_materiascursadas(token, 'TEST', completa=True)[1]
+            # Dejo en cache solo las cursadas anteriores a la ultima fecha
+            viejas = completo[completo['fecha'] < '2019-07-23'].reset_index(drop=True)
+            self.provider.set_cache_binaria(self.provider.clave_cache('materiascursadas-df', 'TEST'),
+                                            DataTransformer().transform_dataframe_to_bytes(viejas),
+                                            'materiascursadas')
+            pedidos = []
+            self.retrieve_contando(pedidos)
+            version, df = self.provider.sincronizar_materiascursadas(token, 'TEST')
+            self.assertEqual(pedidos, [('2019-02-07', (completo['fecha'] >= '2019-02-07').sum())])
+            ordenar = ['alumno', 'codigo', 'fecha']
+            pd.testing.assert_frame_equal(
+                df.astype({'alumno': str, 'codigo': str}).sort_values(ordenar).reset_index(drop=True),
+                completo.astype({'alumno': str, 'codigo': str}).sort_values(ordenar).reset_index(drop=True))
+            self.assertEqual(self.provider.get_materiascursadas_con_version(token, 'TEST')[0], version)
+
+    def test_sincronizar_materiascursadas_sin_cambios(self):
+        """
+            Si el backend no trajo nada nuevo, la version en cache no cambia
+        """
+        with self.mock_app.run(self.url, self.port):
+            token = self.provider.retrieve_token()
+            self.provider.sincronizar_materiascursadas(token, 'TEST', completa=True)
+            version = self.provider.sincronizar_materiascursadas(token, 'TEST')[0]
+            self.assertEqual(self.provider.sincronizar_materiascursadas(token, 'TEST')[0], version)
+
+    def test_sincronizar_materiascursadas_delta_fallido_o_vacio(self):
+        """
+            Si el pedido incremental falla, o no trae nada, el dataset y su version en cache no cambian
+        """
+        with self.mock_app.run(self.url, self.port):
+            token = self.provider.retrieve_token()
+            version, completo = self.provider.sincronizar_materiascursadas(token, 'TEST', completa=True)
+            for error in [Exception, ValueError('El array JSON esta incompleto')]:
+                with mock.patch.object(self.provider, 'retrieve_materiascursadas_registros', side_effect=error):
+                    resultado = self.provider.sincronizar_materiascursadas(token, 'TEST')
+                self.assertEqual(resultado[0], version)
+                pd.testing.assert_frame_equal(resultado[1], completo)
+            with mock.patch.object(self.provider, 'retrieve_materiascursadas_registros', return_value=iter([])):
+                self.assertEqual(self.provider.sincronizar_materiascursadas(token, 'TEST')[0], version)
+            self.assertEqual(self.provider.get_materiascursadas_con_version(token, 'TEST')[0], version)
+
+    def test_sincronizar_materiascursadas_completa(self):
+        """
+            La sincronizacion completa trae todo de nuevo, aunque haya un dataset en cache
+        """
+        with self.mock_app.run(self.url, self.port):
+            token = self.provider.retrieve_token()
+            self.provider.sincronizar_materiascursadas(token, 'TEST', completa=True)
+            pedidos = []
+            self.retrieve_contando(pedidos)
+            self.provider.sincronizar_materiascursadas(token, 'TEST', completa=True)
+            self.assertEqual(pedidos, [(None, 20)])
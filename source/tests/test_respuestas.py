@@ -0,0 +1,68 @@
+import unittest
+import importlib.util
+import json
+import pandas as pd
+import numpy as np
+from unittest import mock
+import respuestas
+from config import app
+
+
+class RespuestasTest(unittest.TestCase):
+
+    def setUp(self):
+        self.df = pd.DataFrame({
+            'alumno': pd.Categorical(['1', '2', None, '1']),
+            'nombre': ['Ana', 'José "Pepe"', None, '100%'],
+            'nota': [7.5, np.nan, 1e16, -0.1],
+            'cantidad': [1, 2, 3, 4],
+            'aprobada': [True, False, True, True],
+        })
+        self.columnas = {'alumno': 'Alumno', 'nombre': 'Nombre %s', 'nota': 'Nota',
+                         'cantidad': 'Cantidad', 'aprobada': 'Aprobación'}
+
+    def test_registros_igual_a_json_dumps(self):
+        """
+            El JSON es el mismo, byte a byte, que el de armar un diccionario por fila
+        """
+        esperado = json.dumps([{nombre: fila[columna] for columna, nombre in self.columnas.items()}
+                               for _, fila in self.df.iterrows()])
+        self.assertEqual(respuestas.registros(self.df, self.columnas), esperado)
+
+    def test_registros_vacio(self):
+        self.assertEqual(respuestas.registros(self.df.iloc[0:0], self.columnas), '[]')
+
+    def test_dumps_con_crudos(self):
+        """
+            Los Crudo dentro de diccionarios se insertan sin volver a serializarlos
+        """
+        data = {1: {'notas': respuestas.registros(self.df, {'nota': 'Nota'}), 'lista': [{'a': None}]}}
+        esperado = {1: {'notas': [{'Nota': nota} for nota in self.df['nota']], 'lista': [{'a': None}]}}
+        self.assertEqual(respuestas.dumps(data), json.dumps(esperado))
+
+    @unittest.skipUnless(importlib.util.find_spec('orjson'), 'orjson no esta instalado')
+    def test_orjson(self):
+        """
+            Con orjson el JSON es compacto y los NaN son null, pero los datos son los mismos
+        """
+        app.config['CODIFICADOR_JSON'] = 'orjson'
+        try:
+            texto = respuestas.dumps({'registros': respuestas.registros(self.df, self.columnas)})
+        finally:
+            app.config['CODIFICADOR_JSON'] = 'json'
+        self.assertNotIn(', ', texto)
+        esperado = json.loads(json.dumps({'registros': json.loads(
+            respuestas.registros(self.df, self.columnas).replace('NaN', 'null'))}))
+        self.assertEqual(json.loads(texto), esperado)
+
+    def test_orjson_no_instalado(self):
+        """
+            Si orjson no esta instalado se usa json, con el formato de siempre
+        """
+        app.config['CODIFICADOR_JSON'] = 'orjson'
+        try:
+            with mock.patch.dict('sys.modules', {'orjson': None}), mock.patch.object(respuestas, '_orjson', None):
+                texto = respuestas.dumps({'registros': respuestas.registros(self.df, self.columnas)})
+        finally:
+            app.config['CODIFICADOR_JSON'] = 'json'
+        self.assertEqual(texto, respuestas.dumps({'registros': respuestas.registros(self.df, self.columnas)}))
@@ -0,0 +1,58 @@
+import unittest
+from unittest import mock
+import pandas as pd
+from mock_server import mock_app
+from provider import DataProvider
+from transformer import DataTransformer
+from manipulator import DataManipulator
+import snapshots
+
+
+class SnapshotsTest(unittest.TestCase):
+
+    def setUp(self):
+        self.provider = DataProvider()
+        self.mock_app = mock_app
+        self.url = "localhost"
+        self.port = 8008
+
+    def tearDown(self):
+        snapshots._snapshots.clear()
+
+    def test_construir_snapshot(self):
+        """
+            El snapshot tiene lo mismo que calcular todo en el request
+        """
+        with self.mock_app.run(self.url, self.port):
+            token = self.provider.retrieve_token()
+            snapshot = snapshots.construir_snapshot(token, 'TEST', '2019')
+            cursadas = self.provider.get_materiascursadas_dataframe(token, 'TEST')
+            plan = DataTransformer().transform_to_dataframe(self.provider.get_plan(token, 'TEST', '2019'))
+        merged = DataTransformer().merge_materias_con_plan(cursadas, plan)
+        pd.testing.assert_frame_equal(snapshot.merged, merged)
+        pd.testing.assert_frame_equal(snapshot.scores, DataManipulator().get_scores_periodos(merged))
+        pd.testing.assert_frame_equal(snapshot.indexer.filtrar_alumno('1'), merged.loc[merged.alumno == '1'])
+        self.assertIs(snapshots.get_snapshot('TEST', '2019'), snapshot)
+
+    def test_refrescar_en_segundo_plano(self):
+        """
+            El snapshot nuevo reemplaza al anterior cuando termina de construirse
+        """
+        with self.mock_app.run(self.url, self.port):
+            token = self.provider.retrieve_token()
+            anterior = snapshots.construir_snapshot(token, 'TEST', '2019')
+            snapshots.refrescar_en_segundo_plano(token, 'TEST', '2019')
+            # Espero a que el thread de los snapshots termine lo pendiente
+            snapshots.get_executor().submit(lambda: None).result()
+        nuevo = snapshots.get_snapshot('TEST', '2019')
+        self.assertIsNot(nuevo, anterior)
+        self.assertFalse(snapshots._pendientes)
+
+    def test_refrescar_con_error_mantiene_el_anterior(self):
+        with self.mock_app.run(self.url, self.port):
+            token = self.provider.retrieve_token()
+            anterior = snapshots.construir_snapshot(token, 'TEST', '2019')
+        with mock.patch.object(snapshots, 'construir_snapshot', side_effect=Exception):
+            snapshots.refrescar_en_segundo_plano(token, 'TEST', '2019')
+            snapshots.get_executor().submit(lambda: None).result()
+        self.assertIs(snapshots.get_snapshot('TEST', '2019'), anterior)
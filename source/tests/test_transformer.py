@@ -68,6 +68,31 @@ class TransformerTest(unittest.TestCase):
         semestre_resultado = self.transformer.fecha_periodo(fecha)
         self.assertEqual(semestre_esperado, semestre_resultado)
 
+    def test_fechas_periodo_vectorizado(self):
+        """
+            La version vectorizada tiene que coincidir con fecha_periodo para cada fecha
+        """
+        fechas = pd.Series(['2020-05-12', '2020-02-12', '2020-11-12', '2020-03-31', '2020-10-01'])
+        esperado = [self.transformer.fecha_periodo(fecha) for fecha in fechas]
+        resultado = self.transformer.fechas_periodo(fechas).tolist()
+        self.assertEqual(esperado, resultado)
+
+    def test_periodos_semestre_vectorizado(self):
+        periodos = pd.Series(['2020-06-30', '2019-12-31'])
+        esperado = ['2020-S1', '2019-S2']
+        resultado = self.transformer.periodos_semestre(periodos).tolist()
+        self.assertEqual(esperado, resultado)
+
+    def test_fechas_periodo_con_fecha_nula(self):
+        """
+            Una fecha faltante solo deja sin periodo a su fila
+        """
+        fechas = pd.Series(['2018-11-12', None, '2019-02-07'])
+        periodos = self.transformer.fechas_periodo(fechas)
+        self.assertEqual(periodos.tolist(), ['2018-12-31', None, '2018-12-31'])
+        semestres = self.transformer.periodos_semestre(periodos)
+        self.assertEqual(semestres.tolist(), ['2018-S2', None, '2018-S2'])
+
     def test_timestamp_to_semester(self):
         timestamp = '2020-07-01 12:12:12'
         esperado = '2020-S2'
@@ -102,7 +127,15 @@ class TransformerTest(unittest.TestCase):
         pass
 
     def test_merge_materias_con_plan(self):
-        pass
+        """
+            El merge mantiene el orden de las cursadas y descarta las que no estan en el plan
+        """
+        materias = pd.DataFrame({'alumno': ['2', '1', '1', '1'], 'codigo': ['c2', 'c1', 'c2', 'c3']})
+        plan = pd.DataFrame({'codigo': ['c1', 'c2'], 'materia': ['Materia 1', 'Materia 2']})
+        data = self.transformer.merge_materias_con_plan(materias, plan)
+        self.assertEqual(data.codigo.tolist(), ['c2', 'c1', 'c2'])
+        self.assertEqual(data.materia.tolist(), ['Materia 2', 'Materia 1', 'Materia 2'])
+        self.assertEqual(list(data.columns), ['alumno', 'codigo', 'materia'])
 
     def test_transform_scores_unicos(self):
         pass
@@ -110,5 +143,84 @@ class TransformerTest(unittest.TestCase):
     def test_materiascursadas_to_dataframe(self):
         pass
 
+    def test_iterar_json_array_de_a_partes(self):
+        """
+            Aunque el JSON llegue cortado en partes chicas (incluso a mitad de un caracter),
+            se obtienen los mismos elementos
+        """
+        with open('source/tests/json/api_carreras_materiascursadas.json', 'rb') as archivo:
+            texto = archivo.read()
+        texto = texto.replace(b'TEST', 'TÉST'.encode('utf8'))
+        partes = [texto[i:i + 7] for i in range(0, len(texto), 7)]
+        resultado = list(self.transformer.iterar_json_array(partes))
+        self.assertEqual(resultado, json.loads(texto))
+
+    def test_iterar_json_array_incompleto(self):
+        """
+            Una respuesta cortada, o que no es un array JSON, lanza ValueError
+        """
+        for texto in [b'[{"a":1},{"a":2},{"a"', b'[{"a":1},{"a":2}', b'[{"a":1}{"a":2}]',
+                      b'<html><body>502 Bad Gateway</body></html>', b'', b'[] x']:
+            with self.assertRaises(ValueError):
+                list(self.transformer.iterar_json_array([texto[:5], texto[5:]]))
+        self.assertEqual(list(self.transformer.iterar_json_array([b' [ ', b'] '])), [])
+
+    def test_registros_to_dataframe_tipos(self):
+        with open('source/tests/json/api_carreras_materiascursadas.json', 'r') as archivo:
+            data = json.loads(archivo.read())
+        df = self.transformer.transform_materiascursadas_registros_to_dataframe(iter(data))
+        esperado = self.transformer.transform_materiascursadas_to_dataframe(data)
+        self.assertEqual(list(df.columns), list(esperado.columns))
+        self.assertEqual(df.codigo.dtype, 'category')
+        self.assertEqual(df.fecha.dtype, 'datetime64[ns]')
+        self.assertEqual(df.codigo.tolist(), esperado.codigo.tolist())
+        self.assertEqual(df.nota.tolist(), esperado.nota.tolist())
+        self.assertEqual(df.fecha.tolist(), esperado.fecha.tolist())
+        self.assertEqual(self.transformer.transform_fechas_to_str(df.fecha).tolist()[0], data[0]['fecha'])
+
+    def test_registros_to_dataframe_columnas_faltantes(self):
+        """
+            Si un registro no tiene una columna, queda como nulo
+        """
+        df = self.transformer.transform_registros_to_dataframe([{'a': '1'}, {'b': '2'}])
+        self.assertEqual(df.a.tolist(), ['1', None])
+        self.assertEqual(df.b.tolist(), [None, '2'])
+
+    def test_materiascursadas_tipos(self):
+        """
+            Las materias cursadas quedan con codigos categoricos, fecha datetime
+            y la nota numerica con las notas especiales resueltas
+        """
+        data = [{'materia': '1', 'alumno': '1', 'nota': 'A', 'fecha': '2019-02-07', 'resultado': 'A', 'forma_aprobacion': 'P'},
+                {'materia': '1', 'alumno': '2', 'nota': 'R', 'fecha': '2019-02-07', 'resultado': 'R', 'forma_aprobacion': 'Ex'},
+                {'materia': '1', 'alumno': '3', 'nota': 'PA', 'fecha': '2019-02-07', 'resultado': 'E', 'forma_aprobacion': 'Ex'},
+                {'materia': '2', 'alumno': '3', 'nota': '8', 'fecha': '2019-07-07', 'resultado': 'P', 'forma_aprobacion': 'P'}]
+        df = self.transformer.transform_materiascursadas_to_dataframe(data)
+        for columna in ['codigo', 'alumno', 'resultado', 'forma_aprobacion']:
+            self.assertEqual(df[columna].dtype, 'category')
+        self.assertEqual(df.fecha.dtype, 'datetime64[ns]')
+        self.assertEqual(df.nota.tolist(), ['A', 'R', 'PA', '8'])
+        self.assertEqual(df.nota_numerica.tolist()[:2], [7, 3])
+        self.assertTrue(np.isnan(df.nota_numerica[2]))
+        self.assertEqual(df.nota_numerica[3], 8)
+
+    def test_dataframe_to_bytes_ida_y_vuelta(self):
+        """
+            Un DataFrame serializado en formato columnar se reconstruye igual
+        """
+        with open('source/tests/json/api_carreras_materiascursadas.json', 'r') as archivo:
+            df = self.transformer.transform_materiascursadas_to_dataframe(json.loads(archivo.read()))
+        df['nota_float'] = pd.to_numeric(df.nota, errors='coerce')
+        df['resultado'] = df.resultado.astype('category')
+        data = self.transformer.transform_dataframe_to_bytes(df)
+        resultado = self.transformer.transform_bytes_to_dataframe(data)
+        pd.testing.assert_frame_equal(df, resultado)
+
+    def test_dataframe_to_bytes_con_nulos(self):
+        df = pd.DataFrame({'acta_examen': ['1', None, '3']})
+        resultado = self.transformer.transform_bytes_to_dataframe(
+            self.transformer.transform_dataframe_to_bytes(df))
+        self.assertEqual(resultado.acta_examen.tolist(), ['1', None, '3'])
+
     def test_transform_to_dataframe(self):
         pass
\ No newline at end of file
@@ -1,5 +1,14 @@
-from pandas.io.json import json_normalize
-import pandas as pd
+import json
+import codecs
+import struct
+import zlib
+from array import array
+from datetime import datetime
+from utils import ModuloLazy
+from metricas import medido
+
+pd = ModuloLazy('pandas')
+np = ModuloLazy('numpy')
 
 
 class DataTransformer:
@@ -7,26 +16,278 @@ class DataTransformer:
     formas_aprobacion = {'EqE': 'Equivalencia equivalente', 'PC': 'Promocion en otra carrera', 'P': 'Promocion',
                          'Eq': 'Equivalencia', 'ExE': 'Examen equivalente', 'Ex': 'Examen'}
 
+    # Tipos de las columnas de materias cursadas, que se deciden al momento de la ingesta
+    tipos_materiascursadas = {'codigo': 'category', 'alumno': 'category', 'resultado': 'category',
+                              'forma_aprobacion': 'category', 'carrera': 'category',
+                              'fecha': 'datetime64[ns]'}
+
+    # Valor numerico de las notas que no son un numero
+    valores_notas = {'A': 7, 'R': 3}
+
+    @medido
     def transform_to_dataframe(self, data):
-        return json_normalize(data)
+        return pd.io.json.json_normalize(data)
 
+    @medido
     def transform_materiascursadas_to_dataframe(self, data):
-        materias = json_normalize(data)
+        materias = pd.io.json.json_normalize(data)
         materias.rename(columns={'materia': 'codigo'}, inplace=True)
+        return self.transform_tipos_materiascursadas(materias)
+
+    def transform_tipos_materiascursadas(self, materias):
+        """
+            Lleva las columnas de materias cursadas a los tipos de tipos_materiascursadas
+            y agrega nota_numerica, la nota como float con las notas especiales ya resueltas.
+            La columna nota queda como texto, tal como viene del backend
+        """
+        for columna, tipo in self.tipos_materiascursadas.items():
+            if columna in materias.columns and materias[columna].dtype != tipo:
+                if tipo == 'datetime64[ns]':
+                    materias[columna] = pd.to_datetime(materias[columna])
+                else:
+                    materias[columna] = materias[columna].astype(tipo)
+        if 'nota' in materias.columns:
+            materias['nota_numerica'] = self.transform_notas_to_float(materias['nota'])
         return materias
 
+    def transform_notas_to_float(self, notas):
+        """
+            Convierte las notas a float: 'A' (aprobada sin nota) vale 7 y 'R' (reprobada sin nota) vale 3.
+            Las pendientes ('PA'), las vacias y las faltantes quedan como NaN
+        """
+        def nota_a_float(nota):
+            try:
+                return float(self.valores_notas.get(nota, nota))
+            except (TypeError, ValueError):
+                return np.nan
+        # Si la columna es categorica, map convierte solo las categorias
+        return notas.map(nota_a_float).astype(float)
+
+    def iterar_json_array(self, chunks):
+        """
+            Parsea de forma incremental un array JSON que llega de a partes (bytes)
+            y va retornando sus elementos a medida que se completan,
+            sin tener toda la respuesta en memoria.
+            Si lo que llega no es un array JSON, o termina antes de cerrarse, lanza ValueError
+            (los elementos ya retornados no alcanzan para tomar la respuesta como completa)
+        """
+        decoder = json.JSONDecoder()
+        utf8 = codecs.getincrementaldecoder('utf-8')()
+        buffer = ''
+        # Lo que sigue en el array: '[', el primer elemento (o ']'), un elemento, ',' o ']', y el fin
+        esperado = '['
+        for chunk in chunks:
+            buffer += utf8.decode(chunk)
+            posicion = 0
+            while True:
+                while posicion < len(buffer) and buffer[posicion] in ' \t\r\n':
+                    posicion += 1
+                if posicion == len(buffer):
+                    break
+                caracter = buffer[posicion]
+                if esperado == '[':
+                    if caracter != '[':
+                        raise ValueError('La respuesta no es un array JSON')
+                    posicion += 1
+                    esperado = 'primero'
+                elif esperado == 'primero' and caracter == ']':
+                    posicion += 1
+                    esperado = 'fin'
+                elif esperado in ('primero', 'elemento'):
+                    try:
+                        elemento, posicion = decoder.raw_decode(buffer, posicion)
+                    except ValueError:
+                        # El elemento todavia no llego completo
+                        break
+                    esperado = 'separador'
+                    yield elemento
+                elif esperado == 'separador' and caracter in ',]':
+                    posicion += 1
+                    esperado = 'elemento' if caracter == ',' else 'fin'
+                else:
+                    raise ValueError('Caracter inesperado en el array JSON: {!r}'.format(caracter))
+            buffer = buffer[posicion:]
+        buffer += utf8.decode(b'', final=True)
+        if esperado != 'fin' or buffer.strip():
+            raise ValueError('El array JSON esta incompleto')
+
+    def transform_registros_to_dataframe(self, registros, tipos=None):
+        """
+            Construye un DataFrame a partir de un iterable de registros planos (dicts),
+            columna por columna y sin tener todos los registros en memoria.
+            Cada columna se guarda codificada (un entero por fila mas sus valores distintos)
+            y al final se convierte al tipo pedido en tipos: 'category', 'datetime64[ns]' u objeto
+        """
+        tipos = tipos or {}
+        codigos = {}
+        valores = {}
+        filas = 0
+        for registro in registros:
+            for nombre in registro:
+                if nombre not in codigos:
+                    # Columna nueva: las filas anteriores no tenian el valor
+                    codigos[nombre] = array('i', [-1]) * filas
+                    valores[nombre] = {}
+            for nombre, columna in codigos.items():
+                valor = registro.get(nombre)
+                if valor is None:
+                    columna.append(-1)
+                else:
+                    valores_columna = valores[nombre]
+                    codigo = valores_columna.get(valor)
+                    if codigo is None:
+                        codigo = valores_columna[valor] = len(valores_columna)
+                    columna.append(codigo)
+            filas += 1
+
+        columnas = {}
+        for nombre, columna in codigos.items():
+            codigos_columna = np.frombuffer(columna, dtype=np.int32) if filas else np.array([], dtype=np.int32)
+            distintos = list(valores[nombre])
+            tipo = tipos.get(nombre)
+            if tipo == 'category':
+                columnas[nombre] = pd.Categorical.from_codes(codigos_columna, distintos)
+            elif tipo == 'datetime64[ns]':
+                # Se parsea una sola vez cada fecha distinta; el -1 queda como NaT
+                fechas = pd.to_datetime(distintos + [None]).values
+                columnas[nombre] = fechas[codigos_columna]
+            else:
+                columnas[nombre] = np.array(distintos + [None], dtype=object)[codigos_columna]
+        return pd.DataFrame(columnas, columns=list(codigos), index=pd.RangeIndex(filas))
+
+    @medido
+    def transform_materiascursadas_registros_to_dataframe(self, registros):
+        """
+            Ingesta de materias cursadas registro a registro, con los tipos de tipos_materiascursadas
+        """
+        tipos = dict(self.tipos_materiascursadas)
+        tipos['materia'] = tipos.pop('codigo')
+        materias = self.transform_registros_to_dataframe(registros, tipos)
+        materias.rename(columns={'materia': 'codigo'}, inplace=True)
+        return self.transform_tipos_materiascursadas(materias)
+
+    @medido
+    def actualizar_materiascursadas(self, materias, nuevas, desde):
+        """
+            Reemplaza las materias cursadas desde la fecha desde (inclusive) por las nuevas,
+            que son las que trajo el backend a partir de esa fecha.
+            Las categorias que no estaban se agregan al final, como en una ingesta completa.
+            Si las nuevas son las mismas que ya estaban, o no llego ninguna, retorna materias sin copiarlo
+        """
+        if nuevas.empty:
+            return materias
+        nuevas = nuevas[nuevas['fecha'] >= desde]
+        recientes = materias[materias['fecha'] >= desde]
+        if len(recientes) == len(nuevas) and set(recientes.columns) == set(nuevas.columns) and \
+                recientes.reset_index(drop=True).astype(object).equals(
+                    nuevas[recientes.columns].reset_index(drop=True).astype(object)):
+            return materias
+        # Las que no tienen fecha no vuelven en una sincronizacion incremental, se conservan
+        materias = materias[~(materias['fecha'] >= desde)]
+        df = pd.concat([materias, nuevas], ignore_index=True, sort=False)
+        for columna, tipo in self.tipos_materiascursadas.items():
+            if tipo == 'category' and columna in materias.columns and columna in nuevas.columns:
+                df[columna] = pd.api.types.union_categoricals([materias[columna], nuevas[columna]])
+        return df
+
+    def transform_fechas_to_str(self, fechas):
+        """
+            Si las fechas son de tipo datetime las formatea como texto (YYYY-MM-DD),
+            sino las retorna como vienen
+        """
+        if pd.api.types.is_datetime64_any_dtype(fechas):
+            return fechas.dt.strftime('%Y-%m-%d')
+        return fechas
+
+    @medido
+    def transform_dataframe_to_bytes(self, df):
+        """
+            Serializa un DataFrame en un formato binario columnar.
+            Las columnas de texto y categoricas se guardan como codigos enteros mas sus categorias,
+            y el resto como el buffer de valores. Cada buffer va comprimido.
+            Formato: largo del encabezado (4 bytes) + encabezado JSON + buffers
+        """
+        columnas = []
+        buffers = []
+        for nombre in df.columns:
+            serie = df[nombre]
+            if isinstance(serie.dtype, pd.CategoricalDtype):
+                tipo = 'categoria'
+                valores = serie.cat.codes.to_numpy()
+                categorias = serie.cat.categories.tolist()
+            elif serie.dtype == object:
+                tipo = 'objeto'
+                valores, categorias = pd.factorize(serie)
+                categorias = list(categorias)
+            else:
+                tipo = 'valores'
+                valores = serie.to_numpy()
+                categorias = None
+            if categorias is not None:
+                # Achico los codigos al menor entero que alcance
+                valores = valores.astype(
+                    np.min_scalar_type(-len(categorias) - 1))
+            buffer = zlib.compress(np.ascontiguousarray(valores).tobytes())
+            columnas.append({'nombre': nombre, 'tipo': tipo, 'dtype': valores.dtype.str,
+                             'categorias': categorias, 'largo': len(buffer)})
+            buffers.append(buffer)
+        encabezado = json.dumps({'columnas': columnas, 'filas': len(df)}).encode('utf8')
+        return struct.pack('<I', len(encabezado)) + encabezado + b''.join(buffers)
+
+    @medido
+    def transform_bytes_to_dataframe(self, data):
+        """
+            Reconstruye un DataFrame serializado con transform_dataframe_to_bytes
+        """
+        largo_encabezado = struct.unpack_from('<I', data)[0]
+        inicio = 4 + largo_encabezado
+        encabezado = json.loads(data[4:inicio].decode('utf8'))
+        columnas = {}
+        for columna in encabezado['columnas']:
+            fin = inicio + columna['largo']
+            valores = np.frombuffer(zlib.decompress(
+                data[inicio:fin]), dtype=columna['dtype'])
+            inicio = fin
+            if columna['tipo'] == 'categoria':
+                columnas[columna['nombre']] = pd.Categorical.from_codes(
+                    valores, columna['categorias'])
+            elif columna['tipo'] == 'objeto':
+                # El codigo -1 es un valor nulo, que queda al final de las categorias
+                categorias = np.array(columna['categorias'] + [None], dtype=object)
+                columnas[columna['nombre']] = categorias[valores]
+            else:
+                columnas[columna['nombre']] = valores.copy()
+        return pd.DataFrame(columnas, columns=[c['nombre'] for c in encabezado['columnas']],
+                            index=pd.RangeIndex(encabezado['filas']))
+
+    @medido
     def transform_scores_unicos(self, df):
         scores = df[['periodo_semestre', 'score_periodo']].drop_duplicates()
         return scores.sort_values(['periodo_semestre'], ascending=[1])
 
+    @medido
+    def transform_scores_unicos_por_alumno(self, df):
+        """
+            Igual que transform_scores_unicos, pero de varios alumnos a la vez
+        """
+        scores = df[['alumno', 'periodo_semestre', 'score_periodo']].drop_duplicates()
+        return scores.sort_values(['alumno', 'periodo_semestre'], kind='mergesort')
+
+    @medido
     def merge_materias_con_plan(self, materias, plan):
-        return pd.merge(materias, plan, on=['codigo'])
+        """
+            Mergea las cursadas con el plan, manteniendo el orden de las cursadas.
+            Asi es lo mismo filtrar las cursadas antes o despues de mergear
+        """
+        data = pd.merge(materias, plan, on=['codigo'], how='left', indicator='_merge_plan')
+        data = data.loc[data['_merge_plan'] == 'both'].drop(columns=['_merge_plan'])
+        return data.reset_index(drop=True)
 
+    @medido
     def merge_materias_con_promedio(self, materias, alumnos):
         return pd.merge(materias, alumnos, on=['alumno'])
 
     def transform_timestamp_to_datetime(self, timestamp):
-        from datetime import datetime
         return datetime.strptime(str(timestamp), '%Y-%m-%d %H:%M:%S')
 
     def transform_date_to_semester(self, date):
@@ -44,7 +305,6 @@ class DataTransformer:
         """
             Dado un timestamp, digo a que semestre pertenece
         """
-        import datetime
         date = self.transform_timestamp_to_datetime(timestamp)
         semester = self.transform_date_to_semester(date)
         return semester
@@ -58,8 +318,10 @@ class DataTransformer:
             Si la fecha es mayor a marzo y menor a octubre
                 periodo: anio-06-30
         """
-        from datetime import datetime
-        fecha = datetime.strptime(str(fecha_str), '%Y-%m-%d')
+        if isinstance(fecha_str, datetime):
+            fecha = fecha_str
+        else:
+            fecha = datetime.strptime(str(fecha_str), '%Y-%m-%d')
         if fecha.month > 10:
             return '{}-12-31'.format(fecha.year)
         elif fecha.month <= 3:
@@ -73,13 +335,43 @@ class DataTransformer:
             Si el mes que viene es 12, fue agrupada como segundo semestre
             Sino, es primer semestre
         """
-        from datetime import datetime
         fecha = datetime.strptime(str(periodo), '%Y-%m-%d')
         if fecha.month == 12:
             return '{}-S2'.format(fecha.year)
         else:
             return '{}-S1'.format(fecha.year)
 
+    def fechas_periodo(self, fechas):
+        """
+            Version vectorizada de fecha_periodo.
+            Recibe una Serie de fechas y retorna una Serie con el periodo de cada una,
+            calculado para toda la columna de una sola vez.
+            Las fechas faltantes quedan con periodo None
+        """
+        fechas = pd.to_datetime(fechas, format='%Y-%m-%d')
+        validas = fechas.notna().to_numpy()
+        meses = fechas.dt.month.to_numpy()[validas].astype(int)
+        # Las fechas de enero a marzo pertenecen al segundo semestre del año anterior
+        anios = fechas.dt.year.to_numpy()[validas].astype(int) - (meses <= 3)
+        sufijos = np.where((meses > 3) & (meses <= 10), '-06-30', '-12-31')
+        periodos = np.full(len(fechas), None, dtype=object)
+        periodos[validas] = np.char.add(anios.astype(str), sufijos)
+        return pd.Series(periodos, index=fechas.index)
+
+    def periodos_semestre(self, periodos):
+        """
+            Version vectorizada de periodo_semestre.
+            Recibe una Serie de periodos y retorna una Serie con el semestre de cada uno.
+            Los periodos faltantes quedan con semestre None
+        """
+        periodos = pd.to_datetime(periodos, format='%Y-%m-%d')
+        validos = periodos.notna().to_numpy()
+        sufijos = np.where(periodos.dt.month.to_numpy()[validos] == 12, '-S2', '-S1')
+        anios = periodos.dt.year.to_numpy()[validos].astype(int).astype(str)
+        semestres = np.full(len(periodos), None, dtype=object)
+        semestres[validos] = np.char.add(anios, sufijos)
+        return pd.Series(semestres, index=periodos.index)
+
     def get_forma_aprobacion(self, forma_aprobacion):
         try:
             return self.formas_aprobacion[forma_aprobacion]
@@ -1,2 +1,30 @@
+import importlib
+
+
+class ModuloLazy:
+    """
+        Importa el modulo recien cuando se usa alguno de sus atributos, asi los
+        modulos pesados (pandas, NumPy) no se cargan al importar la app sino en el
+        primer request que los necesita. import_module es seguro entre threads.
+        Cada atributo se guarda la primera vez, y despues se encuentra sin pasar por aca
+    """
+
+    def __init__(self, nombre):
+        self._nombre = nombre
+
+    def __getattr__(self, atributo):
+        valor = getattr(importlib.import_module(self._nombre), atributo)
+        setattr(self, atributo, valor)
+        return valor
+
+
+np = ModuloLazy('numpy')
+
+
 def calcular_score_materia(obligatorias, indice_aprobacion):
+    """
+        Acepta escalares o Series, en cuyo caso calcula el score de todas las materias a la vez
+    """
+    if np.ndim(obligatorias) or np.ndim(indice_aprobacion):
+        return obligatorias.astype(float) * (1 - indice_aprobacion.astype(float) / 100)
     return float(obligatorias) * (1 - float(indice_aprobacion / 100))
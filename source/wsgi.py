@@ -0,0 +1,51 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+from gunicorn.app.base import BaseApplication
+from config import app as flask_app
+import snapshots
+import procesos
+
+
+def post_fork(server, worker):
+    # Los threads no sobreviven al fork, cada worker arranca el suyo
+    if flask_app.config['USAR_SNAPSHOTS']:
+        snapshots.iniciar_refresco_periodico()
+
+
+def worker_exit(server, worker):
+    # Se descartan los snapshots pendientes y se cierra el pool de calculos para que el worker termine rapido
+    if snapshots._executor is not None:
+        snapshots._executor.shutdown(wait=False)
+    if procesos._pool is not None:
+        procesos._pool.shutdown(wait=False)
+
+
+class ServidorWSGI(BaseApplication):
+    """
+        Sirve la app con gunicorn: varios procesos worker, cada uno con sus threads.
+        La app se carga una sola vez en el proceso principal antes de forkear (preload),
+        asi los workers comparten las paginas de pandas/NumPy ya importadas.
+        Con SIGTERM los workers terminan los requests en curso antes de salir
+    """
+
+    def __init__(self, application):
+        self.application = application
+        super().__init__()
+
+    def load_config(self):
+        config = {
+            'bind': flask_app.config['WSGI_BIND'],
+            'workers': flask_app.config['WSGI_WORKERS'],
+            'threads': flask_app.config['WSGI_THREADS'],
+            'worker_class': 'gthread' if flask_app.config['WSGI_THREADS'] > 1 else 'sync',
+            'timeout': flask_app.config['WSGI_TIMEOUT'],
+            'graceful_timeout': flask_app.config['WSGI_GRACEFUL_TIMEOUT'],
+            'preload_app': True,
+            'post_fork': post_fork,
+            'worker_exit': worker_exit,
+        }
+        for clave, valor in config.items():
+            self.cfg.set(clave, valor)
+
+    def load(self):
+        return self.application